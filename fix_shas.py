@@ -1,35 +1,252 @@
+"""Pin GitHub Actions references in workflows to canonical SHAs.
+
+Usage:
+    python fix_shas.py                 # control center workflows + sync tiers
+    python fix_shas.py --fleet         # also every checkout in repos_list.txt
+    python fix_shas.py --fleet -j 8    # with an explicit worker count
+    python fix_shas.py --no-manifest   # rescan files even if unchanged
+    python fix_shas.py --refresh-refs  # update the ref cache and actions-lock.json
+    python fix_shas.py --check --json report.json   # read-only drift gate
+    python fix_shas.py --fleet --dry-run            # unified diff, no writes
+    python fix_shas.py --fleet --index              # also refresh the usage index
+    python fix_shas.py --fleet --where actions/setup-node@v4
+    python fix_shas.py --fleet --where @main
+    python fix_shas.py --fleet --git-objects        # pin from blobs onto a branch
+    python fix_shas.py --watch                      # re-pin files as they are saved
+"""
+
+import argparse
+import json
 import os
-import re
-
-replacements = {
-    r'actions/checkout@[0-9a-f]{40,}': 'actions/checkout@8e8c483db84b4bee98b60c0593521ed34d9990e8',
-    r'actions/setup-python@[0-9a-f]{40,}': 'actions/setup-python@83679a892e2d95755f2dac6acb0bfd1e9ac5d548',
-    r'actions/github-script@[0-9a-f]{40,}': 'actions/github-script@ed597411d8f924073f98dfc5c65a23a2325f34cd',
-    r'actions/upload-artifact@[0-9a-f]{40,}': 'actions/upload-artifact@b7c566a772e6b6bfb58ed0dc250532a479d7789f',
-    r'actions/download-artifact@[0-9a-f]{40,}': 'actions/download-artifact@37930b1c2abaa49bbe596cd826c3c89aef350131',
-    r'actions/add-to-project@[0-9a-f]{40,}': 'actions/add-to-project@244f685bbc3b7adfa8466e08b698b5577571133e',
-    r'stefanzweifel/git-auto-commit-action@[0-9a-f]{40,}': 'stefanzweifel/git-auto-commit-action@04702edda442b2e678b25b537cec683a1493fcb9',
-    r'pozil/auto-assign-issue@[0-9a-f]{40,}': 'pozil/auto-assign-issue@39c06395cbac76e79afc4ad4e5c5c6db6ecfdd2e'
-}
-
-def fix_file(path):
-    with open(path, 'r') as f:
-        content = f.read()
-    
-    new_content = content
-    for pattern, replacement in replacements.items():
-        new_content = re.sub(pattern, replacement, new_content)
-    
-    if new_content != content:
-        with open(path, 'w') as f:
-            f.write(new_content)
-        print(f"Fixed {path}")
-
-# Workflows to check
-dirs = ['.github/workflows', 'repository-files/always-sync/.github/workflows']
-for d in dirs:
-    if not os.path.isdir(d):
-        continue
-    for f in os.listdir(d):
-        if f.endswith('.yml'):
-            fix_file(os.path.join(d, f))
+import sys
+
+from pinning.check import check_paths
+from pinning.fleet import (
+    DEFAULT_ECOSYSTEM_ROOT, Root, collect_targets, discover_roots, load_repos_list, pin_fleet,
+)
+from pinning.gitobjects import DEFAULT_BRANCH, discover_git_dirs, pin_repos
+from pinning.index import DEFAULT_INDEX, UsageIndex
+from pinning.lockfile import DEFAULT_LOCKFILE, DEFAULT_REF_CACHE, Lockfile, RefCache
+from pinning.manifest import DEFAULT_MANIFEST, Manifest
+from pinning.stream import load_rules
+from pinning.watch import DEFAULT_DEBOUNCE, Watcher
+from pinning.writeback import WriteBack
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Workflows to check when not running in fleet mode
+DIRS = [
+    '.github/workflows',
+    'sync-files/always-sync/global/.github/workflows',
+]
+
+def refresh_lockfile(lockfile_path, ref_cache_dir):
+    """Refresh the ref cache and store the re-resolved SHAs in the lockfile."""
+    refs = RefCache(ref_cache_dir)
+    lockfile = Lockfile.load(lockfile_path)
+    for repo in refs.refresh(lockfile.repos()):
+        print(f"Warning: could not list refs for {repo}", file=sys.stderr)
+    for action in lockfile.update(refs):
+        print(f"Locked {action} to {lockfile.entries[action].sha}")
+    lockfile.save()
+    return lockfile
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pin GitHub Actions references to canonical SHAs.")
+    parser.add_argument("--fleet", action="store_true",
+                        help="pin the control center, sync tiers and every repo in repos_list.txt")
+    parser.add_argument("--repos-list", default=os.path.join(REPO_ROOT, "repos_list.txt"))
+    parser.add_argument("--ecosystem-root", default=None,
+                        help="directory holding repo checkouts (default: ecosystems/oss)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="worker processes (default: available cores with --fleet, else 1)")
+    parser.add_argument("--manifest", default=os.path.join(REPO_ROOT, DEFAULT_MANIFEST),
+                        help="fingerprint manifest used to skip unchanged files")
+    parser.add_argument("--no-manifest", action="store_true",
+                        help="scan every file regardless of the manifest")
+    parser.add_argument("--lockfile", default=os.path.join(REPO_ROOT, DEFAULT_LOCKFILE),
+                        help="action lockfile (default: actions-lock.json)")
+    parser.add_argument("--ref-cache", default=os.path.join(REPO_ROOT, DEFAULT_REF_CACHE),
+                        help="local cache of mirrored git refs used to resolve tags and branches")
+    parser.add_argument("--refresh-refs", action="store_true",
+                        help="refresh the ref cache with git ls-remote and re-resolve the lockfile")
+    parser.add_argument("--check", action="store_true",
+                        help="verify only: report drift and exit 1 without writing any file")
+    parser.add_argument("--all-drift", action="store_true",
+                        help="with --check, report every drifted reference instead of the first per file")
+    parser.add_argument("--json", metavar="PATH",
+                        help="with --check, write a JSON report to PATH ('-' for stdout)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="print a unified diff of the pending edits instead of writing them")
+    parser.add_argument("--index", action="store_true",
+                        help="update the SQLite usage index after pinning or checking")
+    parser.add_argument("--index-path", default=os.path.join(REPO_ROOT, DEFAULT_INDEX))
+    parser.add_argument("--where", metavar="ACTION[@REF]|@REF",
+                        help="list indexed references to an action and/or ref (no pinning)")
+    parser.add_argument("--git-objects", action="store_true",
+                        help="pin blobs from each repo's object database and commit them on a branch")
+    parser.add_argument("--rev", default="HEAD", help="with --git-objects, revision to pin")
+    parser.add_argument("--branch", default=DEFAULT_BRANCH,
+                        help=f"with --git-objects, branch to commit to (default: {DEFAULT_BRANCH})")
+    parser.add_argument("--watch", action="store_true",
+                        help="after pinning, keep running and re-pin workflows as they change")
+    parser.add_argument("--debounce", type=float, default=DEFAULT_DEBOUNCE,
+                        help=f"with --watch, seconds of quiet that end a batch (default: {DEFAULT_DEBOUNCE})")
+    parser.add_argument("--poll", action="store_true",
+                        help="with --watch, poll file stats instead of using inotify")
+    args = parser.parse_args(argv)
+
+    lockfile = None
+    if os.path.exists(args.lockfile):
+        if args.refresh_refs:
+            lockfile = refresh_lockfile(args.lockfile, args.ref_cache)
+        else:
+            lockfile = Lockfile.load(args.lockfile)
+    rules = load_rules(args.lockfile, args.ref_cache)
+    if lockfile is not None:
+        for action, entry in sorted(lockfile.entries.items()):
+            if action not in rules:
+                print(f"Warning: {action}@{entry.ref} is not in the ref cache; run with --refresh-refs",
+                      file=sys.stderr)
+
+    if args.git_objects:
+        return git_objects(rules, args)
+
+    if args.fleet:
+        repos = load_repos_list(args.repos_list) if os.path.exists(args.repos_list) else []
+        roots = discover_roots(REPO_ROOT, repos, args.ecosystem_root)
+        jobs = args.jobs
+        if not (args.check or args.dry_run or args.where):
+            print(f"Pinning {len(roots)} root(s)")
+    else:
+        roots = [Root(d, os.path.join(REPO_ROOT, d)) for d in DIRS]
+        jobs = args.jobs or 1
+
+    if args.where:
+        return where(roots, rules, jobs, args)
+
+    manifest = None if args.no_manifest else Manifest(args.manifest, rules.fingerprint)
+    if args.check:
+        status = check(roots, rules, jobs, manifest, args)
+        update_index(roots, rules, jobs, args)
+        return status
+
+    writeback = WriteBack()
+    result = pin_fleet(roots, rules, jobs=jobs, manifest=manifest,
+                       writeback=writeback, dry_run=args.dry_run)
+    if args.dry_run:
+        writeback.diff(sys.stdout)
+        return 0
+
+    sys.stdout.writelines(f"Fixed {path}\n" for path, changed in result.pinned if changed)
+    for path in result.conflicts:
+        print(f"Warning: {path} changed during the run; left untouched", file=sys.stderr)
+    for path in result.unreadable:
+        print(f"Warning: {path} is not valid UTF-8; skipped", file=sys.stderr)
+    for path, held in result.held:
+        print(f"Warning: {path}: {held} reference(s) do not resolve to the locked commit; "
+              f"left as they are (see --check)", file=sys.stderr)
+    if result.reused:
+        print(f"Reused {result.reused} plan(s) from identical files")
+    if manifest is not None:
+        manifest.save()
+        if result.skipped:
+            print(f"Skipped {result.skipped} unchanged file(s)")
+    update_index(roots, rules, jobs, args)
+    if args.watch:
+        return watch(roots, rules, args)
+    return 0
+
+
+def watch(roots, rules, args):
+    with Watcher(roots, rules, debounce=args.debounce, polling=args.poll) as watcher:
+        print(f"Watching {len(roots)} root(s); press Ctrl-C to stop", file=sys.stderr)
+        try:
+            watcher.run(report_watch)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+def report_watch(result):
+    if result.conflict:
+        print(f"Warning: {result.path} changed while it was being pinned; left untouched",
+              file=sys.stderr)
+    elif result.changed:
+        print(f"Fixed {result.path} ({result.latency * 1000:.1f} ms)", flush=True)
+    if result.held:
+        print(f"Warning: {result.path}: {result.held} reference(s) do not resolve to the "
+              f"locked commit; left as they are", file=sys.stderr)
+
+
+def git_objects(rules, args):
+    repos = []
+    if args.fleet and os.path.exists(args.repos_list):
+        repos = load_repos_list(args.repos_list)
+    ecosystem_root = args.ecosystem_root or os.path.join(REPO_ROOT, DEFAULT_ECOSYSTEM_ROOT)
+    gitdirs = discover_git_dirs(REPO_ROOT, repos, ecosystem_root)
+    status = 0
+    for result in pin_repos(gitdirs, rules, rev=args.rev, branch=args.branch, jobs=args.jobs):
+        if result.error:
+            print(f"Error: {result.gitdir}: {result.error}", file=sys.stderr)
+            status = 1
+            continue
+        for path in result.unreadable:
+            print(f"Warning: {result.gitdir}: {path} is not valid UTF-8; skipped", file=sys.stderr)
+        if result.commit:
+            print(f"{result.gitdir}: pinned {len(result.files)} file(s) on {args.branch} "
+                  f"({result.commit[:12]})")
+    return status
+
+
+def update_index(roots, rules, jobs, args):
+    if args.index:
+        with UsageIndex(args.index_path) as index:
+            report_index(index.update(roots, rules, jobs=jobs))
+
+
+def report_index(stats):
+    if stats["unreadable"]:
+        print(f"Warning: {stats['unreadable']} workflow(s) are not valid UTF-8 and were not indexed",
+              file=sys.stderr)
+
+
+def where(roots, rules, jobs, args):
+    action, _, ref = args.where.partition("@")
+    with UsageIndex(args.index_path) as index:
+        report_index(index.update(roots, rules, jobs=jobs))
+        usages = index.query(action=action or None, ref=ref or None)
+    sys.stdout.writelines(
+        f"{u.repo}\t{u.path}:{u.line}\t{u.action}@{u.ref}\t{u.state}\n" for u in usages
+    )
+    return 0
+
+
+def check(roots, rules, jobs, manifest, args):
+    paths, skipped = collect_targets(roots, manifest)
+    report = check_paths(paths, rules, jobs=jobs, manifest=manifest, skipped=skipped,
+                         first_only=not args.all_drift)
+    if manifest is not None:
+        manifest.save()
+
+    if args.json:
+        data = json.dumps(report.to_dict(), indent=2)
+        if args.json == "-":
+            print(data)
+        else:
+            with open(args.json, "w") as f:
+                f.write(data + "\n")
+    if args.json != "-":
+        for d in report.drift:
+            print(f"{d.path}:{d.line}: {d.action}@{d.ref} should be {d.expected}")
+        for path in report.unreadable:
+            print(f"{path}: not valid UTF-8; could not be checked")
+        stats = report.to_dict()["stats"]
+        print(f"Checked {report.files} file(s), skipped {report.skipped} "
+              f"({stats['files_per_second']:.0f} files/s)", file=sys.stderr)
+    return 0 if report.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""SHA pinning engine for GitHub Actions references in ecosystem workflows."""
+
+from pinning.check import CheckReport, Drift, check_file, check_paths
+from pinning.files import find_targets, pin_file
+from pinning.fleet import FleetResult, Root, collect_targets, discover_roots, pin_fleet, run_pool
+from pinning.gitobjects import CatFile, RepoResult, pin_repo, pin_repos
+from pinning.index import Usage, UsageIndex
+from pinning.lockfile import LockEntry, Lockfile, RefCache
+from pinning.manifest import Fingerprint, Manifest
+from pinning.rules import DEFAULT_PINS, PinRules
+from pinning.scanner import FilePlan, PlanCache, plan_file
+from pinning.stream import load_rules, pin_bytes, pin_stream, pin_tar, pin_text
+from pinning.watch import WatchResult, Watcher
+from pinning.writeback import CommitResult, WriteBack, pin_mapped
+
+__all__ = [
+    "CatFile",
+    "CheckReport",
+    "CommitResult",
+    "DEFAULT_PINS",
+    "Drift",
+    "FilePlan",
+    "Fingerprint",
+    "FleetResult",
+    "LockEntry",
+    "Lockfile",
+    "Manifest",
+    "PinRules",
+    "PlanCache",
+    "RefCache",
+    "RepoResult",
+    "Root",
+    "Usage",
+    "UsageIndex",
+    "WatchResult",
+    "Watcher",
+    "WriteBack",
+    "check_file",
+    "check_paths",
+    "collect_targets",
+    "discover_roots",
+    "find_targets",
+    "load_rules",
+    "pin_bytes",
+    "pin_file",
+    "pin_fleet",
+    "pin_mapped",
+    "pin_repo",
+    "pin_repos",
+    "pin_stream",
+    "pin_tar",
+    "pin_text",
+    "plan_file",
+    "run_pool",
+]
@@ -0,0 +1,7 @@
+"""``python -m pinning``: pin a tar stream from stdin to stdout."""
+
+import sys
+
+from pinning.stream import main
+
+sys.exit(main())
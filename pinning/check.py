@@ -0,0 +1,151 @@
+"""Read-only drift verification for the pinning engine.
+
+The check never writes a workflow. It reuses the mmap line scanner, and by
+default stops reading a file at its first drifted reference, which is enough
+to fail the gate. Files with no drift are recorded in the manifest so the next
+check can skip them without opening them.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import time
+from dataclasses import asdict, dataclass, field
+
+from pinning.fleet import run_pool
+from pinning.manifest import Fingerprint, Manifest
+from pinning.rules import PinRules
+from pinning.scanner import candidate_lines
+
+
+@dataclass(frozen=True)
+class Drift:
+    """A ``uses:`` reference that does not match its expected pin."""
+
+    path: str
+    line: int
+    action: str
+    ref: str
+    expected: str
+
+
+@dataclass
+class CheckReport:
+    """Drift found by a check run and how fast it was found."""
+
+    drift: list[Drift] = field(default_factory=list)
+    files: int = 0
+    bytes: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+    #: Files that could not be checked because they are not valid UTF-8.
+    unreadable: list[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.drift and not self.unreadable
+
+    def to_dict(self) -> dict:
+        seconds = self.seconds or 1e-9
+        return {
+            "ok": self.ok,
+            "drift": [asdict(d) for d in self.drift],
+            "unreadable": self.unreadable,
+            "stats": {
+                "files": self.files,
+                "skipped": self.skipped,
+                "unreadable": len(self.unreadable),
+                "bytes": self.bytes,
+                "seconds": round(self.seconds, 6),
+                "files_per_second": round(self.files / seconds, 1),
+                "bytes_per_second": round(self.bytes / seconds, 1),
+            },
+        }
+
+
+def check_file(
+    path: str, rules: PinRules, first_only: bool = True
+) -> tuple[list[Drift], int, Fingerprint | None, bool]:
+    """Find drifted references in ``path`` without modifying it.
+
+    Args:
+        path: File to verify.
+        rules: Pin table to verify against.
+        first_only: Stop at the first drifted reference.
+
+    Returns:
+        The drift found, the file size, a fingerprint when the file is clean
+        (so it can be recorded in the manifest), and whether the file was
+        unreadable because a ``uses:`` line is not valid UTF-8.
+    """
+    found: list[Drift] = []
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return found, 0, Fingerprint.of(path, b""), False
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            line_no, pos = 1, 0
+            for start, end in candidate_lines(buf):
+                # Count newlines up to this line without copying the gap.
+                nl = buf.find(b"\n", pos, start)
+                while nl != -1:
+                    line_no += 1
+                    nl = buf.find(b"\n", nl + 1, start)
+                pos = start
+                try:
+                    line = buf[start:end].decode("utf-8")
+                except UnicodeDecodeError:
+                    return found, size, None, True
+                for action, ref, expected in rules.drift(line):
+                    found.append(Drift(path, line_no, action, ref, expected))
+                    if first_only:
+                        return found, size, None, False
+            if found:
+                return found, size, None, False
+            digest = hashlib.sha256(buf).hexdigest()
+    st = os.stat(path)
+    return found, size, Fingerprint(st.st_size, st.st_mtime_ns, digest), False
+
+
+def check_all_drift(
+    path: str, rules: PinRules
+) -> tuple[list[Drift], int, Fingerprint | None, bool]:
+    """:func:`check_file` that reports every drifted reference."""
+    return check_file(path, rules, first_only=False)
+
+
+def check_paths(
+    paths: list[str],
+    rules: PinRules,
+    jobs: int | None = 1,
+    manifest: Manifest | None = None,
+    skipped: int = 0,
+    first_only: bool = True,
+) -> CheckReport:
+    """Verify ``paths`` against ``rules`` and time the run.
+
+    Args:
+        paths: Files to verify, typically from
+            :func:`~pinning.fleet.collect_targets`.
+        rules: Pin table to verify against.
+        jobs: Worker processes; ``None`` uses every available core.
+        manifest: If given, clean files are recorded in it.
+        skipped: Files already skipped as fresh, carried into the report.
+        first_only: Stop reading each file at its first drift.
+    """
+    report = CheckReport(skipped=skipped)
+    started = time.perf_counter()
+    func = check_file if first_only else check_all_drift
+    results = run_pool(func, paths, rules, jobs)
+    for path, (found, size, fingerprint, unreadable) in zip(paths, results):
+        report.drift.extend(found)
+        if unreadable:
+            report.unreadable.append(path)
+        report.files += 1
+        report.bytes += size
+        if manifest is not None and fingerprint is not None:
+            manifest.record(path, fingerprint)
+    report.seconds = time.perf_counter() - started
+    return report
@@ -0,0 +1,43 @@
+"""Locating and pinning workflow files on disk."""
+
+from __future__ import annotations
+
+import os
+from typing import Iterator
+
+from pinning.rules import PinRules
+from pinning.writeback import pin_mapped
+
+WORKFLOW_SUFFIXES = (".yml", ".yaml")
+ACTION_FILES = ("action.yml", "action.yaml")
+
+# Directories that never hold workflows we own. ``ecosystems`` holds the
+# repo checkouts, which are discovered as separate roots by the fleet.
+SKIP_DIRS = frozenset({".git", "node_modules", ".cache", ".venv", "venv", "ecosystems", "_build"})
+
+
+def is_target(path: str) -> bool:
+    """Return True for workflow files and composite action definitions."""
+    parts = os.path.abspath(path).split(os.sep)
+    if parts[-1] in ACTION_FILES:
+        return True
+    return (
+        len(parts) >= 3
+        and parts[-3:-1] == [".github", "workflows"]
+        and parts[-1].endswith(WORKFLOW_SUFFIXES)
+    )
+
+
+def find_targets(root: str) -> Iterator[str]:
+    """Yield every workflow and ``action.yml`` below ``root``."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS)
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            if is_target(path):
+                yield path
+
+
+def pin_file(path: str, rules: PinRules) -> int:
+    """Pin ``path`` in place and return the number of references changed."""
+    return pin_mapped(path, rules)[0]
@@ -0,0 +1,220 @@
+"""Fleet-wide pinning across the control center and ecosystem checkouts.
+
+Targets from every root are flattened into one work list and spread over a
+process pool, so the whole org is pinned in roughly the time of its largest
+repo rather than the sum of all of them.
+"""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, TypeVar
+
+from pinning.files import find_targets
+from pinning.manifest import Manifest
+from pinning.rules import PinRules
+from pinning.scanner import plan_shared
+from pinning.writeback import WriteBack
+
+# Where scripts/sync-files checks out the ecosystem repos.
+DEFAULT_ECOSYSTEM_ROOT = os.path.join("ecosystems", "oss")
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class Root:
+    """A directory tree to pin, labelled with the repo it belongs to."""
+
+    name: str
+    path: str
+
+
+@dataclass
+class FleetResult:
+    """Outcome of a fleet run."""
+
+    #: ``(path, changed)`` for every file that was actually scanned.
+    pinned: list[tuple[str, int]] = field(default_factory=list)
+    #: Files skipped because their manifest fingerprint still matched.
+    skipped: int = 0
+    #: Files that changed on disk between planning and write-back.
+    conflicts: list[str] = field(default_factory=list)
+    #: Scanned files whose plan was reused from an identical file.
+    reused: int = 0
+    #: ``(path, held)`` for files with drifted references that were left
+    #: as they are; ``--check`` reports them.
+    held: list[tuple[str, int]] = field(default_factory=list)
+    #: Files skipped because they are not valid UTF-8.
+    unreadable: list[str] = field(default_factory=list)
+
+
+def load_repos_list(path: str) -> list[str]:
+    """Read ``repos_list.txt``, skipping blank lines and comments."""
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def checkout_candidates(ecosystem_root: str, entry: str) -> list[str]:
+    """Paths under ``ecosystem_root`` where a ``repos_list.txt`` entry may live."""
+    if "/" in entry:
+        owner, name = entry.split("/", 1)
+        return [os.path.join(ecosystem_root, name), os.path.join(ecosystem_root, owner, name)]
+    # A bare org name: every repo checked out under ``<ecosystem_root>/<org>``.
+    org_dir = os.path.join(ecosystem_root, entry)
+    if not os.path.isdir(org_dir):
+        return []
+    return [os.path.join(org_dir, d) for d in sorted(os.listdir(org_dir))]
+
+
+def discover_roots(
+    control_center: str,
+    repos: Iterable[str] = (),
+    ecosystem_root: str | None = None,
+) -> list[Root]:
+    """Resolve the control center and every checked-out ecosystem repo.
+
+    The control center root covers its own workflows and actions as well as
+    the ``sync-files`` and ``repository-files`` tiers. Entries in ``repos``
+    without a checkout under ``ecosystem_root`` are skipped.
+    """
+    control_center = os.path.realpath(control_center)
+    if ecosystem_root is None:
+        ecosystem_root = os.path.join(control_center, DEFAULT_ECOSYSTEM_ROOT)
+
+    roots = [Root("jbcom/control-center", control_center)]
+    seen = {control_center}
+    for entry in repos:
+        for candidate in checkout_candidates(ecosystem_root, entry):
+            real = os.path.realpath(candidate)
+            if real in seen or not os.path.isdir(real):
+                continue
+            seen.add(real)
+            name = entry if "/" in entry else f"{entry}/{os.path.basename(real)}"
+            roots.append(Root(name, real))
+    return roots
+
+
+def default_jobs() -> int:
+    """Number of cores this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def collect_targets(
+    roots: Iterable[Root], manifest: Manifest | None = None
+) -> tuple[list[str], int]:
+    """List the targets under ``roots`` that the manifest cannot vouch for.
+
+    Returns:
+        The stale paths in discovery order and the number of fresh ones.
+    """
+    paths = []
+    skipped = 0
+    for root in roots:
+        for path in find_targets(root.path):
+            if manifest is not None and manifest.is_fresh(path):
+                skipped += 1
+            else:
+                paths.append(path)
+    return paths, skipped
+
+
+_worker_rules: PinRules | None = None
+_worker_func: Callable[[str, PinRules], T] | None = None
+
+
+def _init_worker(func: Callable[[str, PinRules], T], rules: PinRules) -> None:
+    global _worker_func, _worker_rules
+    _worker_func, _worker_rules = func, rules
+
+
+def _run_one(path: str) -> T:
+    assert _worker_func is not None and _worker_rules is not None
+    return _worker_func(path, _worker_rules)
+
+
+def run_pool(
+    func: Callable[[str, PinRules], T],
+    paths: list[str],
+    rules: PinRules,
+    jobs: int | None = None,
+) -> list[T]:
+    """Apply ``func(path, rules)`` to every path on a process pool.
+
+    ``func`` must be a module-level function. The rules are shipped once per
+    worker rather than once per path, and results keep the order of ``paths``.
+    """
+    if not paths:
+        return []
+    jobs = max(1, min(jobs or default_jobs(), len(paths)))
+    if jobs == 1:
+        return [func(path, rules) for path in paths]
+
+    chunksize = max(1, len(paths) // (jobs * 4))
+    with ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(func, rules)) as pool:
+        return list(pool.map(_run_one, paths, chunksize=chunksize))
+
+
+def pin_fleet(
+    roots: Iterable[Root],
+    rules: PinRules,
+    jobs: int | None = None,
+    manifest: Manifest | None = None,
+    writeback: WriteBack | None = None,
+    dry_run: bool = False,
+) -> FleetResult:
+    """Pin every target under ``roots`` on a process pool.
+
+    Workers only plan edits; every file is then committed together by
+    ``writeback`` in this process, so an interrupted run never leaves a
+    partially written workflow behind. Each worker plans a given file content
+    once and reuses the plan for every identical copy it is handed.
+
+    Args:
+        roots: Trees to scan, typically from :func:`discover_roots`.
+        rules: Pin table shipped once to each worker.
+        jobs: Worker count; defaults to the number of available cores.
+        manifest: If given, files it reports as fresh are skipped without
+            being read, and every scanned file without held drift is
+            recorded in it.
+        writeback: Write-back stage to commit through; a default
+            :class:`~pinning.writeback.WriteBack` is used if omitted.
+        dry_run: Plan only. The edits are left pending in ``writeback``
+            (e.g. for :meth:`~pinning.writeback.WriteBack.diff`) and
+            nothing is written.
+
+    Returns:
+        The scanned files in discovery order and the number skipped.
+    """
+    paths, skipped = collect_targets(roots, manifest)
+    result = FleetResult(skipped=skipped)
+    writeback = writeback if writeback is not None else WriteBack()
+    plans = run_pool(plan_shared, paths, rules, jobs)
+    for plan in plans:
+        writeback.add(plan)
+        result.pinned.append((plan.path, plan.changed))
+        result.reused += plan.reused
+        if plan.held:
+            result.held.append((plan.path, plan.held))
+        if plan.unreadable:
+            result.unreadable.append(plan.path)
+    if dry_run:
+        return result
+
+    committed = writeback.commit()
+    result.conflicts = committed.conflicts
+    conflicts = set(committed.conflicts)
+    for plan in plans:
+        if plan.path in conflicts or plan.held or plan.unreadable:
+            # Keep files with held drift out of the manifest, so a check
+            # still reads them.
+            continue
+        fingerprint = plan.fingerprint or committed.written[plan.path]
+        if manifest is not None:
+            manifest.record(plan.path, fingerprint)
+    result.pinned = [(p, 0 if p in conflicts else n) for p, n in result.pinned]
+    return result
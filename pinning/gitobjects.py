@@ -0,0 +1,245 @@
+"""Pin workflows straight from a repository's object database.
+
+No working tree is read or written. For each repository:
+
+* ``git ls-tree -r`` lists the workflow and ``action.yml`` blobs at a revision;
+* one long-lived ``git cat-file --batch`` process streams every blob;
+* ``git fast-import`` writes the rewritten blobs and a single commit on a
+  branch in one bulk stream.
+
+Bare mirrors and regular clones both work, so the whole fleet can be pinned
+without checking anything out.
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from pinning.files import SKIP_DIRS, is_target
+from pinning.fleet import checkout_candidates, default_jobs
+from pinning.rules import PinRules
+
+DEFAULT_BRANCH = "fix-shas/pin"
+COMMIT_MESSAGE = "ci: pin GitHub Actions references to SHAs"
+
+
+def _git(gitdir: str, *args: str, input: bytes | None = None) -> bytes:
+    return subprocess.run(
+        ["git", f"--git-dir={gitdir}", *args],
+        input=input, check=True, capture_output=True,
+    ).stdout
+
+
+def git_dir(path: str) -> str | None:
+    """Return the git directory of ``path`` (bare or not), or None."""
+    try:
+        out = subprocess.run(
+            ["git", "-C", path, "rev-parse", "--absolute-git-dir"],
+            check=True, capture_output=True, text=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.strip() or None
+
+
+class CatFile:
+    """A long-lived ``git cat-file --batch`` process for one repository."""
+
+    def __init__(self, gitdir: str) -> None:
+        self.proc = subprocess.Popen(
+            ["git", f"--git-dir={gitdir}", "cat-file", "--batch"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        )
+
+    def read(self, obj: str) -> bytes:
+        """Return the contents of ``obj``; raise KeyError if it is missing."""
+        assert self.proc.stdin is not None and self.proc.stdout is not None
+        self.proc.stdin.write(obj.encode() + b"\n")
+        self.proc.stdin.flush()
+        header = self.proc.stdout.readline().split()
+        if len(header) != 3:
+            raise KeyError(obj)
+        size = int(header[2])
+        data = self.proc.stdout.read(size)
+        self.proc.stdout.read(1)  # trailing newline
+        return data
+
+    def close(self) -> None:
+        if self.proc.stdin is not None:
+            self.proc.stdin.close()
+        self.proc.wait()
+
+    def __enter__(self) -> CatFile:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def list_targets(gitdir: str, rev: str) -> list[tuple[str, str, str]]:
+    """Return ``(mode, blob, path)`` for every pin target in ``rev``'s tree."""
+    targets = []
+    for entry in _git(gitdir, "ls-tree", "-r", "-z", "--full-tree", rev).split(b"\0"):
+        if not entry:
+            continue
+        # surrogateescape keeps non-UTF-8 names byte-exact for fast-import.
+        meta, _, path = entry.decode("utf-8", "surrogateescape").partition("\t")
+        mode, kind, blob = meta.split()
+        if kind != "blob" or mode == "120000":
+            continue
+        if SKIP_DIRS.intersection(path.split("/")[:-1]) or not is_target(path):
+            continue
+        targets.append((mode, blob, path))
+    return targets
+
+
+@dataclass
+class RepoResult:
+    """Outcome of pinning one repository from its object database."""
+
+    gitdir: str
+    #: Paths rewritten, with the number of references changed in each.
+    files: list[tuple[str, int]] = field(default_factory=list)
+    #: The new commit on the branch, or None if nothing changed.
+    commit: str | None = None
+    error: str | None = None
+    #: Target paths skipped because their blob is not valid UTF-8.
+    unreadable: list[str] = field(default_factory=list)
+
+
+# C escapes git uses in quoted paths; other control bytes become octal.
+_PATH_ESCAPES = {ord('"'): b'\\"', ord("\\"): b"\\\\", ord("\n"): b"\\n", ord("\t"): b"\\t"}
+
+
+def _quote_path(path: str) -> bytes:
+    """Encode ``path`` for a fast-import command, C-quoting it if needed.
+
+    git fast-import takes a path verbatim unless it starts with ``"``, in
+    which case it is a C-style string; a path with a newline or another
+    control byte must therefore be quoted.
+    """
+    raw = path.encode("utf-8", "surrogateescape")
+    if not raw.startswith(b'"') and not any(b < 0x20 or b == 0x7F for b in raw):
+        return raw
+    out = [b'"']
+    for b in raw:
+        if b in _PATH_ESCAPES:
+            out.append(_PATH_ESCAPES[b])
+        elif b < 0x20 or b == 0x7F:
+            out.append(b"\\%03o" % b)
+        else:
+            out.append(bytes((b,)))
+    out.append(b'"')
+    return b"".join(out)
+
+
+def _fast_import_stream(
+    branch: str, base: str, ident: bytes, message: str, blobs: list[tuple[str, str, bytes]]
+) -> bytes:
+    msg = message.encode()
+    out = [
+        b"commit refs/heads/" + branch.encode() + b"\n",
+        b"committer " + ident + b"\n",
+        b"data %d\n" % len(msg), msg, b"\n",
+        b"from " + base.encode() + b"\n",
+    ]
+    for mode, path, data in blobs:
+        out += [
+            f"M {mode} inline ".encode() + _quote_path(path) + b"\n",
+            b"data %d\n" % len(data), data, b"\n",
+        ]
+    out.append(b"done\n")
+    return b"".join(out)
+
+
+def pin_repo(
+    gitdir: str,
+    rules: PinRules,
+    rev: str = "HEAD",
+    branch: str = DEFAULT_BRANCH,
+    message: str = COMMIT_MESSAGE,
+) -> RepoResult:
+    """Pin every target blob in ``rev`` and commit the result on ``branch``.
+
+    The branch is (re)created on top of ``rev``; no working tree or index is
+    touched. Identical blobs are rewritten only once. A blob that is not
+    valid UTF-8 is left as it is and its path listed in ``unreadable``.
+    """
+    result = RepoResult(gitdir)
+    base = _git(gitdir, "rev-parse", "--verify", f"{rev}^{{commit}}").decode().strip()
+    rewritten: dict[str, tuple[bytes, int] | None] = {}
+    unreadable = set()
+    blobs = []
+    with CatFile(gitdir) as cat:
+        for mode, blob, path in list_targets(gitdir, base):
+            if blob in unreadable:
+                result.unreadable.append(path)
+                continue
+            if blob not in rewritten:
+                try:
+                    text, changed = rules.rewrite(cat.read(blob).decode("utf-8"))
+                except UnicodeDecodeError:
+                    unreadable.add(blob)
+                    result.unreadable.append(path)
+                    continue
+                rewritten[blob] = (text.encode("utf-8"), changed) if changed else None
+            outcome = rewritten[blob]
+            if outcome is not None:
+                blobs.append((mode, path, outcome[0]))
+                result.files.append((path, outcome[1]))
+    if not blobs:
+        return result
+
+    ident = _git(gitdir, "var", "GIT_COMMITTER_IDENT").strip()
+    stream = _fast_import_stream(branch, base, ident, message, blobs)
+    _git(gitdir, "fast-import", "--quiet", "--force", "--done", input=stream)
+    result.commit = _git(gitdir, "rev-parse", f"refs/heads/{branch}").decode().strip()
+    return result
+
+
+def discover_git_dirs(control_center: str, repos: Iterable[str], ecosystem_root: str) -> list[str]:
+    """Git directories of the control center and every checkout or mirror."""
+    found = []
+    seen = set()
+    candidates = [control_center]
+    for entry in repos:
+        for path in checkout_candidates(ecosystem_root, entry):
+            candidates += [path, f"{path}.git"]
+    for path in candidates:
+        if not os.path.isdir(path):
+            continue
+        gitdir = git_dir(path)
+        if gitdir is not None and gitdir not in seen:
+            seen.add(gitdir)
+            found.append(gitdir)
+    return found
+
+
+def _pin_repo_safely(args: tuple[str, PinRules, str, str]) -> RepoResult:
+    gitdir, rules, rev, branch = args
+    try:
+        return pin_repo(gitdir, rules, rev, branch)
+    except (OSError, subprocess.CalledProcessError, UnicodeDecodeError) as e:
+        stderr = getattr(e, "stderr", None)
+        detail = stderr.decode(errors="replace").strip() if stderr else str(e)
+        return RepoResult(gitdir, error=detail)
+
+
+def pin_repos(
+    gitdirs: list[str],
+    rules: PinRules,
+    rev: str = "HEAD",
+    branch: str = DEFAULT_BRANCH,
+    jobs: int | None = None,
+) -> list[RepoResult]:
+    """Pin many repositories concurrently, one worker (and cat-file) each."""
+    work = [(gitdir, rules, rev, branch) for gitdir in gitdirs]
+    jobs = max(1, min(jobs or default_jobs(), len(work) or 1))
+    if jobs == 1:
+        return [_pin_repo_safely(w) for w in work]
+    with ProcessPoolExecutor(jobs) as pool:
+        return list(pool.map(_pin_repo_safely, work))
@@ -0,0 +1,253 @@
+"""SQLite index of every ``uses:`` reference across the ecosystem.
+
+Each row records the file, line, action, ref and pin state of one reference,
+so questions such as "which repos still use ``actions/setup-node@v4``" are
+indexed lookups rather than a grep over every checkout.
+
+The index is updated incrementally: files whose size and mtime are unchanged
+are not opened, files whose content hash is unchanged keep their rows, and
+only the rest are re-extracted. Pin states are recomputed from the stored
+rows (without reading any file) when the pin table changes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import sqlite3
+from dataclasses import dataclass
+from typing import Iterable
+
+from pinning.fleet import Root, run_pool
+from pinning.files import find_targets
+from pinning.rules import SHA_REF, USES_REF, PinRules
+from pinning.scanner import candidate_lines
+
+DEFAULT_INDEX = os.path.join(".cache", "fix-shas", "uses.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS files (
+    path     TEXT PRIMARY KEY,
+    repo     TEXT NOT NULL,
+    sha256   TEXT NOT NULL,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS uses (
+    path     TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    repo     TEXT NOT NULL,
+    line     INTEGER NOT NULL,
+    action   TEXT NOT NULL,
+    ref      TEXT NOT NULL,
+    state    TEXT NOT NULL,
+    expected TEXT
+);
+CREATE INDEX IF NOT EXISTS uses_action_ref ON uses(action, ref);
+CREATE INDEX IF NOT EXISTS uses_ref ON uses(ref);
+CREATE INDEX IF NOT EXISTS uses_repo ON uses(repo);
+CREATE INDEX IF NOT EXISTS uses_state ON uses(state);
+CREATE INDEX IF NOT EXISTS uses_path ON uses(path);
+"""
+
+# Pin states, from best to worst.
+PINNED = "pinned"        # SHA ref matching the expected pin
+UNLOCKED = "unlocked"    # no expected pin is known for this action
+STALE = "stale"          # SHA ref that differs from the expected pin
+FLOATING = "floating"    # tag or branch ref
+
+
+def pin_state(rules: PinRules, action: str, ref: str) -> tuple[str, str | None]:
+    """Classify ``action@ref`` against ``rules``."""
+    expected = rules.expected(action, ref)
+    if not SHA_REF.fullmatch(ref):
+        return FLOATING, expected
+    if expected is None:
+        return UNLOCKED, None
+    return (PINNED if expected == ref else STALE), expected
+
+
+@dataclass(frozen=True)
+class Usage:
+    """One indexed ``uses:`` reference."""
+
+    repo: str
+    path: str
+    line: int
+    action: str
+    ref: str
+    state: str
+    expected: str | None
+
+
+def extract_uses(
+    path: str, rules: PinRules | None = None
+) -> tuple[str, int, int, list[tuple[int, str, str]] | None]:
+    """Read ``path`` once and return its hash, size, mtime and references.
+
+    The references are None if a ``uses:`` line is not valid UTF-8.
+    ``rules`` is accepted so this can run through
+    :func:`~pinning.fleet.run_pool`; extraction does not depend on it.
+    """
+    found = []
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        if st.st_size == 0:
+            return hashlib.sha256(b"").hexdigest(), 0, st.st_mtime_ns, found
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            line_no, pos = 1, 0
+            for start, end in candidate_lines(buf):
+                nl = buf.find(b"\n", pos, start)
+                while nl != -1:
+                    line_no += 1
+                    nl = buf.find(b"\n", nl + 1, start)
+                pos = start
+                try:
+                    line = buf[start:end].decode("utf-8")
+                except UnicodeDecodeError:
+                    return hashlib.sha256(buf).hexdigest(), st.st_size, st.st_mtime_ns, None
+                for match in USES_REF.finditer(line):
+                    found.append((line_no, match.group("action"), match.group("ref")))
+            digest = hashlib.sha256(buf).hexdigest()
+    return digest, st.st_size, st.st_mtime_ns, found
+
+
+class UsageIndex:
+    """Incrementally maintained SQLite index of action references.
+
+    Args:
+        path: Database file; created with its parent directory if needed.
+    """
+
+    def __init__(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self) -> UsageIndex:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def update(self, roots: Iterable[Root], rules: PinRules, jobs: int | None = 1) -> dict[str, int]:
+        """Bring the index up to date with ``roots`` and ``rules``.
+
+        Returns:
+            Counters: files ``seen``, ``unchanged`` (stat match), ``rehashed``
+            (content unchanged), ``extracted``, ``removed`` and
+            ``unreadable`` (not valid UTF-8; skipped and left out of the
+            index, so they are read again next time).
+        """
+        stats = dict(seen=0, unchanged=0, rehashed=0, extracted=0, removed=0, unreadable=0)
+        known = {
+            path: (repo, sha, size, mtime)
+            for path, repo, sha, size, mtime in self.db.execute(
+                "SELECT path, repo, sha256, size, mtime_ns FROM files"
+            )
+        }
+        roots = list(roots)
+        seen: dict[str, str] = {}
+        stale: list[str] = []
+        for root in roots:
+            for path in find_targets(root.path):
+                path = os.path.realpath(path)
+                if path in seen:
+                    continue
+                seen[path] = root.name
+                row = known.get(path)
+                st = os.stat(path)
+                if row and row[0] == root.name and row[2] == st.st_size and row[3] == st.st_mtime_ns:
+                    stats["unchanged"] += 1
+                else:
+                    stale.append(path)
+        stats["seen"] = len(seen)
+
+        with self.db:
+            results = run_pool(extract_uses, stale, rules, jobs)
+            for path, (digest, size, mtime, found) in zip(stale, results):
+                repo = seen[path]
+                if found is None:
+                    stats["unreadable"] += 1
+                    self.db.execute("DELETE FROM files WHERE path = ?", (path,))
+                    continue
+                row = known.get(path)
+                if row and row[0] == repo and row[1] == digest:
+                    stats["rehashed"] += 1
+                    self.db.execute(
+                        "UPDATE files SET size = ?, mtime_ns = ? WHERE path = ?", (size, mtime, path)
+                    )
+                    continue
+                stats["extracted"] += 1
+                self.db.execute("DELETE FROM files WHERE path = ?", (path,))
+                self.db.execute(
+                    "INSERT INTO files (path, repo, sha256, size, mtime_ns) VALUES (?, ?, ?, ?, ?)",
+                    (path, repo, digest, size, mtime),
+                )
+                self.db.executemany(
+                    "INSERT INTO uses (path, repo, line, action, ref, state, expected)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(path, repo, line, action, ref, *pin_state(rules, action, ref))
+                     for line, action, ref in found],
+                )
+
+            # Drop files that disappeared from a root that was scanned.
+            prefixes = tuple(os.path.realpath(r.path) + os.sep for r in roots)
+            gone = [(p,) for p in known if p not in seen and p.startswith(prefixes)]
+            self.db.executemany("DELETE FROM files WHERE path = ?", gone)
+            stats["removed"] = len(gone)
+
+            self._restate(rules)
+        return stats
+
+    def _restate(self, rules: PinRules) -> None:
+        """Recompute pin states from stored rows when the pin table changed."""
+        fingerprint = rules.fingerprint
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'rules'").fetchone()
+        if row is not None and row[0] == fingerprint:
+            return
+        pairs = self.db.execute("SELECT DISTINCT action, ref FROM uses").fetchall()
+        self.db.executemany(
+            "UPDATE uses SET state = ?, expected = ? WHERE action = ? AND ref = ?",
+            [(*pin_state(rules, action, ref), action, ref) for action, ref in pairs],
+        )
+        self.db.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('rules', ?)", (fingerprint,)
+        )
+
+    def query(
+        self,
+        action: str | None = None,
+        ref: str | None = None,
+        repo: str | None = None,
+        state: str | None = None,
+    ) -> list[Usage]:
+        """Return references matching every given filter."""
+        clauses, params = [], []
+        for column, value in (("action", action), ("ref", ref), ("repo", repo), ("state", state)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self.db.execute(
+            "SELECT repo, path, line, action, ref, state, expected FROM uses"
+            f"{where} ORDER BY repo, path, line",
+            params,
+        )
+        return [Usage(*row) for row in rows]
+
+    def repos_using(self, action: str, ref: str | None = None) -> list[str]:
+        """Repos with at least one reference to ``action`` (at ``ref``)."""
+        sql = "SELECT DISTINCT repo FROM uses WHERE action = ?"
+        params = [action]
+        if ref is not None:
+            sql += " AND ref = ?"
+            params.append(ref)
+        return [repo for (repo,) in self.db.execute(sql + " ORDER BY repo", params)]
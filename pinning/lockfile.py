@@ -0,0 +1,236 @@
+"""Action lockfile and offline resolution of tags and branches.
+
+``actions-lock.json`` maps ``owner/repo[/path]`` to the SHA every reference to
+that action is pinned to. An entry may instead name a tag or branch, which is
+resolved against a local cache of mirrored git refs; no network access happens
+unless the cache is explicitly refreshed.
+
+Cache layout (``.cache/action-refs`` by default), per ``owner/repo``:
+
+* ``owner/repo.refs`` - output of ``git ls-remote`` (``<sha>\\t<refname>``), or
+* ``owner/repo.git/`` - a bare ``git clone --mirror`` (``packed-refs`` and
+  loose refs are read directly, without spawning git).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import subprocess
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+LOCK_VERSION = 1
+DEFAULT_LOCKFILE = "actions-lock.json"
+DEFAULT_REF_CACHE = os.path.join(".cache", "action-refs")
+
+SHA_RE = re.compile(r"[0-9a-f]{40}")
+
+
+def repo_of(action: str) -> str:
+    """Return the ``owner/repo`` part of ``owner/repo[/path]``."""
+    return "/".join(action.split("/", 2)[:2])
+
+
+class RefCache:
+    """Lazily loaded ``owner/repo -> {refname: sha}`` tables from disk."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self._refs: dict[str, dict[str, str]] = {}
+
+    def __getstate__(self) -> dict:
+        # Workers reload lazily from disk instead of receiving every table.
+        return {"directory": self.directory, "_refs": {}}
+
+    def _load(self, repo: str) -> dict[str, str]:
+        refs: dict[str, str] = {}
+        listing = os.path.join(self.directory, f"{repo}.refs")
+        mirror = os.path.join(self.directory, f"{repo}.git")
+        if os.path.isfile(listing):
+            with open(listing) as f:
+                for line in f:
+                    sha, _, name = line.strip().partition("\t")
+                    if SHA_RE.fullmatch(sha) and name:
+                        refs[name] = sha
+        elif os.path.isdir(mirror):
+            refs.update(_read_mirror(mirror))
+        return refs
+
+    def refs(self, repo: str) -> dict[str, str]:
+        table = self._refs.get(repo)
+        if table is None:
+            table = self._refs[repo] = self._load(repo)
+        return table
+
+    def resolve(self, repo: str, ref: str) -> str | None:
+        """Resolve a tag, branch or full refname of ``repo`` to a commit SHA."""
+        refs = self.refs(repo)
+        for name in (f"refs/tags/{ref}^{{}}", f"refs/tags/{ref}", f"refs/heads/{ref}", ref):
+            sha = refs.get(name)
+            if sha is not None:
+                return sha
+        return None
+
+    @property
+    def digest(self) -> str:
+        """Hash of every cached ref listing, for cache invalidation.
+
+        Only refs are read: ``*.refs`` listings and each mirror's
+        ``packed-refs`` and ``refs/``, never its objects or packfiles.
+        """
+        h = hashlib.sha256()
+        for dirpath, dirnames, filenames in os.walk(self.directory):
+            mirrors = sorted(d for d in dirnames if d.endswith(".git"))
+            dirnames[:] = sorted(d for d in dirnames if not d.endswith(".git"))
+            paths = [os.path.join(dirpath, name) for name in filenames if name.endswith(".refs")]
+            for mirror in mirrors:
+                gitdir = os.path.join(dirpath, mirror)
+                paths.append(os.path.join(gitdir, "packed-refs"))
+                paths.extend(_files(os.path.join(gitdir, "refs")))
+            for path in sorted(paths):
+                if not os.path.isfile(path):
+                    continue
+                h.update(os.path.relpath(path, self.directory).encode())
+                with open(path, "rb") as f:
+                    h.update(f.read())
+        return h.hexdigest()
+
+    def refresh(self, repos: Iterable[str], remote: str = "https://github.com/{repo}") -> list[str]:
+        """Mirror ``git ls-remote`` output for ``repos`` into the cache.
+
+        This is the only step that touches the network.
+
+        Returns:
+            Repos that could not be listed.
+        """
+        failed = []
+        for repo in sorted(set(repos)):
+            try:
+                out = subprocess.run(
+                    ["git", "ls-remote", "--tags", "--heads", remote.format(repo=repo)],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+            except (OSError, subprocess.CalledProcessError):
+                failed.append(repo)
+                continue
+            listing = os.path.join(self.directory, f"{repo}.refs")
+            os.makedirs(os.path.dirname(listing), exist_ok=True)
+            with open(listing, "w") as f:
+                f.write(out)
+            self._refs.pop(repo, None)
+        return failed
+
+
+def _files(directory: str) -> Iterator[str]:
+    for dirpath, _, filenames in os.walk(directory):
+        for name in filenames:
+            yield os.path.join(dirpath, name)
+
+
+def _read_mirror(gitdir: str) -> dict[str, str]:
+    refs: dict[str, str] = {}
+    packed = os.path.join(gitdir, "packed-refs")
+    if os.path.isfile(packed):
+        last = None
+        with open(packed) as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("^") and last is not None:
+                    refs[f"{last}^{{}}"] = line[1:]
+                elif line and not line.startswith("#"):
+                    sha, _, last = line.partition(" ")
+                    refs[last] = sha
+    refs_dir = os.path.join(gitdir, "refs")
+    for dirpath, _, filenames in os.walk(refs_dir):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            with open(path) as f:
+                sha = f.read().strip()
+            if SHA_RE.fullmatch(sha):
+                refs["refs/" + os.path.relpath(path, refs_dir).replace(os.sep, "/")] = sha
+    return refs
+
+
+@dataclass(frozen=True)
+class LockEntry:
+    """A locked action: a SHA, the ref it was taken from, or both."""
+
+    sha: str | None = None
+    ref: str | None = None
+
+
+class Lockfile:
+    """The ``owner/repo[/path] -> LockEntry`` table in ``actions-lock.json``."""
+
+    def __init__(self, entries: dict[str, LockEntry] | None = None, path: str | None = None) -> None:
+        self.entries = entries or {}
+        self.path = path
+
+    @classmethod
+    def load(cls, path: str) -> Lockfile:
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("version") != LOCK_VERSION:
+            raise ValueError(f"{path}: unsupported lockfile version {data.get('version')!r}")
+        entries = {}
+        for action, entry in data.get("actions", {}).items():
+            entry = LockEntry(entry.get("sha"), entry.get("ref"))
+            if entry.sha is None and entry.ref is None:
+                raise ValueError(f"{path}: {action} needs a sha or a ref")
+            if entry.sha is not None and not SHA_RE.fullmatch(entry.sha):
+                raise ValueError(f"{path}: {action} has an invalid sha {entry.sha!r}")
+            entries[action] = entry
+        return cls(entries, path)
+
+    def save(self, path: str | None = None) -> None:
+        path = path or self.path
+        if path is None:
+            raise ValueError("no lockfile path")
+        actions = {}
+        for action, entry in sorted(self.entries.items()):
+            actions[action] = {k: v for k, v in (("sha", entry.sha), ("ref", entry.ref)) if v}
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"version": LOCK_VERSION, "actions": actions}, f, indent=2)
+            f.write("\n")
+        os.replace(tmp, path)
+
+    def repos(self) -> set[str]:
+        return {repo_of(action) for action in self.entries}
+
+    def resolve(self, cache: RefCache | None = None) -> tuple[dict[str, str], list[str]]:
+        """Build the ``action -> sha`` index, resolving refs through ``cache``.
+
+        Returns:
+            The index and the actions whose ref could not be resolved.
+        """
+        index: dict[str, str] = {}
+        unresolved = []
+        for action, entry in self.entries.items():
+            sha = entry.sha
+            if sha is None and cache is not None:
+                sha = cache.resolve(repo_of(action), entry.ref)
+            if sha is None:
+                unresolved.append(action)
+            else:
+                index[action] = sha
+        return index, unresolved
+
+    def update(self, cache: RefCache) -> list[str]:
+        """Re-resolve every entry that has a ref and store the new SHAs.
+
+        Returns:
+            Actions whose SHA changed.
+        """
+        changed = []
+        for action, entry in self.entries.items():
+            if entry.ref is None:
+                continue
+            sha = cache.resolve(repo_of(action), entry.ref)
+            if sha is not None and sha != entry.sha:
+                self.entries[action] = LockEntry(sha, entry.ref)
+                changed.append(action)
+        return changed
@@ -0,0 +1,98 @@
+"""On-disk fingerprint manifest so unchanged files are never re-read.
+
+Each entry records a file's size, mtime and content hash after it was last
+pinned, together with the hash of the pin table in force at the time. A file
+whose ``stat`` still matches is skipped without opening it; changing the pin
+table invalidates every entry at once.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+
+MANIFEST_VERSION = 1
+DEFAULT_MANIFEST = os.path.join(".cache", "fix-shas", "manifest.json")
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    """Identity of a file's contents as last seen by the pinning engine."""
+
+    size: int
+    mtime_ns: int
+    sha256: str
+
+    @classmethod
+    def of(cls, path: str, data: bytes) -> Fingerprint:
+        """Fingerprint ``path`` whose current contents are ``data``."""
+        st = os.stat(path)
+        return cls(st.st_size, st.st_mtime_ns, hashlib.sha256(data).hexdigest())
+
+
+class Manifest:
+    """Fingerprints of pinned files, valid for a single pin table.
+
+    Args:
+        path: JSON file the manifest is loaded from and saved to.
+        rules_hash: :attr:`PinRules.fingerprint` of the active pin table.
+            Entries recorded under a different table are discarded.
+    """
+
+    def __init__(self, path: str, rules_hash: str) -> None:
+        self.path = path
+        self.rules_hash = rules_hash
+        self.entries: dict[str, Fingerprint] = {}
+        # Files modified at or after this instant may change again within the
+        # same mtime tick, so they are never trusted (the "racy git" problem).
+        self.started_ns = time.time_ns()
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != MANIFEST_VERSION or data.get("rules") != self.rules_hash:
+            return
+        self.entries = {p: Fingerprint(**fp) for p, fp in data.get("files", {}).items()}
+
+    @staticmethod
+    def key(path: str) -> str:
+        return os.path.realpath(path)
+
+    def is_fresh(self, path: str) -> bool:
+        """Return True if ``path`` is unchanged since it was last recorded."""
+        entry = self.entries.get(self.key(path))
+        if entry is None:
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return st.st_size == entry.size and st.st_mtime_ns == entry.mtime_ns
+
+    def record(self, path: str, fingerprint: Fingerprint) -> None:
+        """Remember ``fingerprint`` for ``path`` unless its mtime is racy."""
+        key = self.key(path)
+        if fingerprint.mtime_ns >= self.started_ns:
+            self.entries.pop(key, None)
+        else:
+            self.entries[key] = fingerprint
+
+    def save(self) -> None:
+        """Write the manifest atomically."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        data = {
+            "version": MANIFEST_VERSION,
+            "rules": self.rules_hash,
+            "files": {p: asdict(fp) for p, fp in sorted(self.entries.items())},
+        }
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp, self.path)
@@ -0,0 +1,177 @@
+"""Action pin rules compiled into a single-pass matcher.
+
+Every ``uses: owner/repo[/path]@<ref>`` reference in a file is found by one
+generic pattern, and the action name is resolved against the pin table with a
+dict lookup. The cost of a rewrite therefore depends on the size of the file,
+not on the number of pinned actions.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+from typing import Iterator, Mapping
+
+from pinning.lockfile import Lockfile, RefCache, repo_of
+
+# Canonical SHAs for the actions used across the ecosystem workflows.
+DEFAULT_PINS: dict[str, str] = {
+    "actions/checkout": "8e8c483db84b4bee98b60c0593521ed34d9990e8",
+    "actions/setup-python": "83679a892e2d95755f2dac6acb0bfd1e9ac5d548",
+    "actions/github-script": "ed597411d8f924073f98dfc5c65a23a2325f34cd",
+    "actions/upload-artifact": "b7c566a772e6b6bfb58ed0dc250532a479d7789f",
+    "actions/download-artifact": "37930b1c2abaa49bbe596cd826c3c89aef350131",
+    "actions/add-to-project": "244f685bbc3b7adfa8466e08b698b5577571133e",
+    "stefanzweifel/git-auto-commit-action": "04702edda442b2e678b25b537cec683a1493fcb9",
+    "pozil/auto-assign-issue": "39c06395cbac76e79afc4ad4e5c5c6db6ecfdd2e",
+}
+
+# ``uses: owner/repo[/path]@<ref> [# comment]``. The literal ``uses:`` prefix
+# lets the regex engine skip straight to candidate lines.
+USES_REF = re.compile(
+    r"""(?P<prefix>uses:[ \t]*(?P<q>["']?))"""
+    r"""(?P<action>[\w.-]+/[\w.-]+(?:/[\w.-]+)*)@(?P<ref>[\w./-]+)(?P=q)"""
+    r"""(?P<comment>[ \t]*#[^\n]*)?"""
+)
+SHA_REF = re.compile(r"[0-9a-f]{40,}")
+# A trailing comment that is just a version label, e.g. ``# v6.3.0``.
+LABEL_COMMENT = re.compile(r"([ \t]*#[ \t]*)\S+[ \t]*")
+
+
+class PinRules:
+    """A table of ``action -> sha`` pins applied in a single scan.
+
+    Each ``uses:`` reference costs at most two dict lookups (the full
+    ``owner/repo/path`` and then ``owner/repo``), whatever the table size.
+
+    Args:
+        pins: Mapping of ``owner/repo[/path]`` to the SHA every reference
+            to that action should be rewritten to. Defaults to
+            :data:`DEFAULT_PINS`.
+        labels: Optional ``action -> ref`` naming the ref each pin was taken
+            from; used as the ``# <ref>`` comment on rewritten references.
+        refs: Optional :class:`~pinning.lockfile.RefCache` used to resolve
+            tags and branches, both of actions that are not in ``pins`` and
+            to tell whether a tag other than the locked ref names the
+            locked commit.
+    """
+
+    def __init__(
+        self,
+        pins: Mapping[str, str] | None = None,
+        labels: Mapping[str, str] | None = None,
+        refs: RefCache | None = None,
+    ) -> None:
+        self.pins: dict[str, str] = dict(DEFAULT_PINS if pins is None else pins)
+        self.labels: dict[str, str] = dict(labels or {})
+        self.refs = refs
+        self._refs_digest: str | None = None
+
+    @classmethod
+    def from_lockfile(cls, lockfile: Lockfile, refs: RefCache | None = None) -> PinRules:
+        """Build rules from a lockfile, resolving ref-only entries via ``refs``.
+
+        Entries that cannot be resolved are left out; see
+        :meth:`Lockfile.resolve` to report them.
+        """
+        pins, _ = lockfile.resolve(refs)
+        labels = {a: e.ref for a, e in lockfile.entries.items() if e.ref}
+        return cls(pins, labels, refs)
+
+    def __len__(self) -> int:
+        return len(self.pins)
+
+    def __contains__(self, action: object) -> bool:
+        return action in self.pins
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.pins)
+
+    @property
+    def fingerprint(self) -> str:
+        """Stable hash of the pin table, used to invalidate cached results."""
+        if self.refs is not None and self._refs_digest is None:
+            self._refs_digest = self.refs.digest
+        blob = json.dumps(
+            [self.pins, self.labels, self._refs_digest], sort_keys=True, separators=(",", ":")
+        )
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    def _locked(self, action: str) -> tuple[str | None, str | None]:
+        """Return the locked ``(sha, ref)`` covering ``action``, if any."""
+        pinned = self.pins.get(action)
+        if pinned is None and action.count("/") > 1:
+            action = repo_of(action)
+            pinned = self.pins.get(action)
+        return pinned, self.labels.get(action)
+
+    def _pin(self, action: str, ref: str) -> tuple[str | None, str | None]:
+        """Return the ``(sha, label)`` ``action@ref`` should be rewritten to.
+
+        A SHA is moved to the locked SHA. A tag or branch is only replaced by
+        a commit it is known to name: the locked SHA if it is the locked ref
+        or resolves to the locked commit, or its own resolved SHA if the
+        action is not locked at all. Anything else is held for :meth:`drift`
+        to report, never rewritten to a SHA taken from a different ref.
+        """
+        locked, locked_ref = self._locked(action)
+        if SHA_REF.fullmatch(ref):
+            return locked, locked_ref
+        if locked is not None and ref == locked_ref:
+            return locked, locked_ref
+        resolved = self.refs.resolve(repo_of(action), ref) if self.refs is not None else None
+        if resolved is None or (locked is not None and resolved != locked):
+            return None, None
+        return resolved, locked_ref or ref
+
+    def expected(self, action: str, ref: str | None = None) -> str | None:
+        """Return the SHA ``action@ref`` should be pinned to, or None."""
+        if ref is None:
+            return self._locked(action)[0]
+        return self._pin(action, ref)[0]
+
+    def drift(self, text: str) -> Iterator[tuple[str, str, str]]:
+        """Yield ``(action, ref, expected)`` for every reference that is off its pin.
+
+        That is every reference :meth:`rewrite` would change, and every tag
+        or branch of a locked action it holds because the ref does not
+        resolve to the locked commit; ``expected`` is then the locked SHA.
+        """
+        for match in USES_REF.finditer(text):
+            action, ref = match.group("action"), match.group("ref")
+            pinned = self.expected(action, ref)
+            if pinned is None and not SHA_REF.fullmatch(ref):
+                pinned = self._locked(action)[0]
+            if pinned is not None and pinned != ref:
+                yield action, ref, pinned
+
+    def rewrite(self, text: str) -> tuple[str, int]:
+        """Rewrite every pinned action reference in ``text``.
+
+        Returns:
+            The rewritten text and the number of references that changed.
+        """
+        changed = 0
+
+        def _replace(match: re.Match[str]) -> str:
+            nonlocal changed
+            action, ref = match.group("action"), match.group("ref")
+            pinned, label = self._pin(action, ref)
+            if pinned is None or pinned == ref:
+                return match.group(0)
+            changed += 1
+            comment = match.group("comment") or ""
+            version = LABEL_COMMENT.fullmatch(comment) if comment else None
+            if label is None:
+                # The old label named the SHA being replaced.
+                if version is not None:
+                    comment = ""
+            elif not comment:
+                comment = f" # {label}"
+            elif version is not None:
+                comment = f"{version.group(1)}{label}"
+            q = match.group("q")
+            return f"{match.group('prefix')}{action}@{pinned}{q}{comment}"
+
+        return USES_REF.sub(_replace, text), changed
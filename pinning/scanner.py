@@ -0,0 +1,197 @@
+"""Line-filtered planning of pin edits over a memory-mapped file.
+
+Only ``uses:`` lines can ever change, so the scanner searches the mapping for
+that literal and copies out just the lines around each hit. The result is a
+:class:`FilePlan` of line edits; :mod:`pinning.writeback` applies them.
+
+Most workflows in the fleet are byte-identical copies of the ``sync-files``
+templates, so plans can be memoized by content hash in a :class:`PlanCache`:
+each distinct blob is planned once and its edits (which are offsets into the
+content, and therefore valid for every copy) are reused for the rest.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterator
+
+from pinning.manifest import Fingerprint
+from pinning.rules import PinRules
+
+NEEDLE = b"uses:"
+DEFAULT_CACHE_BYTES = 16 * 1024 * 1024
+# Rough per-entry and per-edit bookkeeping cost, for the cache's memory bound.
+_ENTRY_OVERHEAD = 200
+_EDIT_OVERHEAD = 100
+
+
+@dataclass(frozen=True)
+class Edit:
+    """Replace ``data[start:end]`` (one line, without its newline) with ``line``."""
+
+    start: int
+    end: int
+    line: bytes
+
+
+def candidate_lines(buf: mmap.mmap | bytes) -> Iterator[tuple[int, int]]:
+    """Yield ``(start, end)`` of every line in ``buf`` containing ``uses:``."""
+    pos = buf.find(NEEDLE)
+    while pos != -1:
+        start = buf.rfind(b"\n", 0, pos) + 1
+        end = buf.find(b"\n", pos)
+        if end == -1:
+            end = len(buf)
+        yield start, end
+        pos = buf.find(NEEDLE, end)
+
+
+def plan_edits(buf: mmap.mmap | bytes, rules: PinRules) -> tuple[list[Edit], int, int]:
+    """Compute the line edits ``rules`` would make to ``buf``.
+
+    Returns:
+        The edits in file order, the number of references they change and
+        the number of drifted references ``rules`` holds rather than
+        rewrites (see :meth:`PinRules.drift`).
+    """
+    edits = []
+    total = 0
+    held = 0
+    for start, end in candidate_lines(buf):
+        line = buf[start:end].decode("utf-8")
+        new_line, changed = rules.rewrite(line)
+        if changed:
+            edits.append(Edit(start, end, new_line.encode("utf-8")))
+            total += changed
+            line = new_line
+        held += sum(1 for _ in rules.drift(line))
+    return edits, total, held
+
+
+@dataclass(frozen=True)
+class FilePlan:
+    """The edits one file needs, and the ``stat`` they were planned against."""
+
+    path: str
+    size: int
+    mtime_ns: int
+    edits: tuple[Edit, ...] = ()
+    changed: int = 0
+    #: Fingerprint of the file as read, when it needs no edits.
+    fingerprint: Fingerprint | None = None
+    #: True if the edits were reused from a file with identical contents.
+    reused: bool = False
+    #: Drifted references left as they are because they cannot be pinned
+    #: safely, e.g. a tag other than the locked one.
+    held: int = 0
+    #: True if the file is not valid UTF-8 and was skipped.
+    unreadable: bool = False
+
+
+class PlanCache:
+    """Bounded LRU of planned edits, keyed by the SHA-256 of the content.
+
+    Entries are only valid for one pin table; binding the cache to a
+    different :class:`PinRules` object clears it.
+
+    Args:
+        max_bytes: Approximate memory budget. Least recently used entries
+            are evicted once the edits held exceed it.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[str, tuple[tuple[Edit, ...], int, int]] = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._rules: PinRules | None = None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def _cost(edits: tuple[Edit, ...]) -> int:
+        return _ENTRY_OVERHEAD + sum(_EDIT_OVERHEAD + len(e.line) for e in edits)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.bytes = 0
+
+    def get(self, rules: PinRules, digest: str) -> tuple[tuple[Edit, ...], int, int] | None:
+        """Return the cached ``(edits, changed, held)`` for ``digest`` under ``rules``."""
+        if rules is not self._rules:
+            self.clear()
+            self._rules = rules
+        planned = self.entries.get(digest)
+        if planned is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(digest)
+        self.hits += 1
+        return planned
+
+    def put(self, digest: str, edits: tuple[Edit, ...], changed: int, held: int = 0) -> None:
+        cost = self._cost(edits)
+        if cost > self.max_bytes:
+            return
+        self.entries[digest] = (edits, changed, held)
+        self.bytes += cost
+        while self.bytes > self.max_bytes:
+            _, (old, _, _) = self.entries.popitem(last=False)
+            self.bytes -= self._cost(old)
+
+
+def plan_file(path: str, rules: PinRules, cache: PlanCache | None = None) -> FilePlan:
+    """Plan the rewrite of ``path`` through a memory map, without writing.
+
+    Args:
+        path: File to plan.
+        rules: Pin table to apply.
+        cache: If given, the content is hashed first and a plan made for
+            identical content is reused instead of scanning the file again.
+
+    A file whose ``uses:`` lines are not valid UTF-8 gets a plan with no
+    edits and ``unreadable`` set, rather than aborting the caller's run.
+    """
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        if st.st_size == 0:
+            return FilePlan(path, 0, st.st_mtime_ns, fingerprint=Fingerprint.of(path, b""))
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            digest = None
+            planned = None
+            if cache is not None:
+                digest = hashlib.sha256(buf).hexdigest()
+                planned = cache.get(rules, digest)
+            reused = planned is not None
+            if planned is None:
+                try:
+                    edits, changed, held = plan_edits(buf, rules)
+                except UnicodeDecodeError:
+                    return FilePlan(path, st.st_size, st.st_mtime_ns, unreadable=True)
+                planned = (tuple(edits), changed, held)
+                if cache is not None:
+                    cache.put(digest, *planned)
+            edits, changed, held = planned
+            if edits:
+                return FilePlan(path, st.st_size, st.st_mtime_ns, edits, changed,
+                                reused=reused, held=held)
+            if digest is None:
+                digest = hashlib.sha256(buf).hexdigest()
+    fingerprint = Fingerprint(st.st_size, st.st_mtime_ns, digest)
+    return FilePlan(path, st.st_size, st.st_mtime_ns, fingerprint=fingerprint,
+                    reused=reused, held=held)
+
+
+# One cache per process: pool workers each keep their own for their lifetime.
+_shared_cache = PlanCache()
+
+
+def plan_shared(path: str, rules: PinRules) -> FilePlan:
+    """:func:`plan_file` through this process's shared :class:`PlanCache`."""
+    return plan_file(path, rules, _shared_cache)
@@ -0,0 +1,167 @@
+"""In-memory pinning API for use as a pipeline stage.
+
+Nothing here touches the filesystem apart from loading the pin table, so
+content can be pinned on its way somewhere else, for example while the sync
+flow copies ``sync-files`` into the target repos::
+
+    rules = load_rules("actions-lock.json")
+    for path, data in pin_stream(read_templates(), rules):
+        write_to_target(path, data)
+
+:func:`pin_stream` is a generator over ``(path, bytes)`` pairs: targets are
+rewritten, everything else passes through untouched, and identical blobs are
+planned once via a :class:`~pinning.scanner.PlanCache`. As ``python -m pinning``
+it filters a tar archive from stdin to stdout, so shell pipelines can do the
+same::
+
+    tar -C sync-files/always-sync -cf - . | python -m pinning | tar -C "$target" -xf -
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import os
+import sys
+import tarfile
+from typing import BinaryIO, Callable, Iterable, Iterator
+
+from pinning.files import is_target
+from pinning.lockfile import DEFAULT_LOCKFILE, DEFAULT_REF_CACHE, Lockfile, RefCache
+from pinning.rules import PinRules
+from pinning.scanner import PlanCache, plan_edits
+from pinning.writeback import splice
+
+
+def load_rules(lockfile: str = DEFAULT_LOCKFILE, ref_cache: str = DEFAULT_REF_CACHE) -> PinRules:
+    """Build a pin table from a lockfile and ref cache, without refreshing.
+
+    Falls back to :data:`~pinning.rules.DEFAULT_PINS` if ``lockfile`` does
+    not exist. Lockfile entries the ref cache cannot resolve are left out.
+    """
+    refs = RefCache(ref_cache)
+    if not os.path.exists(lockfile):
+        return PinRules(refs=refs)
+    return PinRules.from_lockfile(Lockfile.load(lockfile), refs)
+
+
+def pin_bytes(data: bytes, rules: PinRules, cache: PlanCache | None = None) -> tuple[bytes, int]:
+    """Pin the UTF-8 workflow ``data``.
+
+    Returns:
+        The pinned content (``data`` itself if nothing changed) and the
+        number of references rewritten.
+
+    Raises:
+        UnicodeDecodeError: If a ``uses:`` line of ``data`` is not UTF-8.
+    """
+    planned = None
+    if cache is not None:
+        digest = hashlib.sha256(data).hexdigest()
+        planned = cache.get(rules, digest)
+    if planned is None:
+        edits, changed, held = plan_edits(data, rules)
+        planned = (tuple(edits), changed, held)
+        if cache is not None:
+            cache.put(digest, *planned)
+    edits, changed, _ = planned
+    if not edits:
+        return data, 0
+    return b"".join(splice(data, edits)), changed
+
+
+def pin_text(text: str, rules: PinRules | None = None) -> tuple[str, int]:
+    """Pin the workflow ``text``; ``rules`` defaults to the built-in table."""
+    return (rules if rules is not None else PinRules()).rewrite(text)
+
+
+def pin_stream(
+    items: Iterable[tuple[str, bytes]],
+    rules: PinRules,
+    cache: PlanCache | None = None,
+    on_pin: Callable[[str, int], None] | None = None,
+    on_skip: Callable[[str], None] | None = None,
+) -> Iterator[tuple[str, bytes]]:
+    """Pin every workflow and ``action.yml`` in a stream of ``(path, bytes)``.
+
+    Args:
+        items: Pairs of a path (relative or absolute; only its last
+            components are used to recognise targets) and its contents.
+        rules: Pin table to apply.
+        cache: Plan cache shared across the stream; a fresh one is used if
+            omitted, so identical blobs are planned once per call.
+        on_pin: Called with ``(path, changed)`` for every target that had
+            references rewritten.
+        on_skip: Called with the path of every target that is not valid
+            UTF-8; its contents are passed through unpinned.
+
+    Yields:
+        The same pairs in the same order, with target contents pinned.
+    """
+    cache = cache if cache is not None else PlanCache()
+    for path, data in items:
+        if is_target(path):
+            try:
+                data, changed = pin_bytes(data, rules, cache)
+            except UnicodeDecodeError:
+                if on_skip is not None:
+                    on_skip(path)
+            else:
+                if changed and on_pin is not None:
+                    on_pin(path, changed)
+        yield path, data
+
+
+def pin_tar(
+    src: BinaryIO,
+    dst: BinaryIO,
+    rules: PinRules,
+    on_skip: Callable[[str], None] | None = None,
+) -> int:
+    """Copy a tar stream from ``src`` to ``dst``, pinning targets in flight.
+
+    Targets that are not valid UTF-8 are copied unpinned and passed to
+    ``on_skip``.
+
+    Returns:
+        The number of members that were rewritten.
+    """
+    count = 0
+    cache = PlanCache()
+    with tarfile.open(fileobj=src, mode="r|*") as tin, tarfile.open(fileobj=dst, mode="w|") as tout:
+        for member in tin:
+            if not member.isfile():
+                tout.addfile(member)
+                continue
+            f = tin.extractfile(member)
+            data = f.read() if f is not None else b""
+            if is_target(member.name):
+                try:
+                    data, changed = pin_bytes(data, rules, cache)
+                except UnicodeDecodeError:
+                    if on_skip is not None:
+                        on_skip(member.name)
+                else:
+                    count += bool(changed)
+            member.size = len(data)
+            tout.addfile(member, io.BytesIO(data))
+    return count
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m pinning",
+        description="Pin GitHub Actions references in a tar stream (stdin to stdout).",
+    )
+    parser.add_argument("--lockfile", default=DEFAULT_LOCKFILE)
+    parser.add_argument("--ref-cache", default=DEFAULT_REF_CACHE)
+    args = parser.parse_args(argv)
+    rules = load_rules(args.lockfile, args.ref_cache)
+
+    def skipped(name: str) -> None:
+        print(f"Warning: {name} is not valid UTF-8; copied unpinned", file=sys.stderr)
+
+    count = pin_tar(sys.stdin.buffer, sys.stdout.buffer, rules, on_skip=skipped)
+    print(f"Pinned {count} file(s)", file=sys.stderr)
+    return 0
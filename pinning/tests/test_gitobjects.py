@@ -0,0 +1,66 @@
+"""Tests for pinning straight from a repository's object database."""
+
+from __future__ import annotations
+
+import shutil
+import subprocess
+
+import pytest
+
+from pinning.gitobjects import pin_repo
+from pinning.rules import PinRules
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+SHA = "a" * 40
+STALE = "0" * 40
+RULES = PinRules({"actions/checkout": SHA}, {"actions/checkout": "v6.3.0"})
+ACTION = f"runs:\n  steps:\n    - uses: actions/checkout@{STALE}\n"
+
+
+def _git(repo, *args):
+    return subprocess.run(["git", "-C", str(repo), *args], check=True, capture_output=True).stdout
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    for var in ("GIT_AUTHOR_NAME", "GIT_COMMITTER_NAME"):
+        monkeypatch.setenv(var, "test")
+    for var in ("GIT_AUTHOR_EMAIL", "GIT_COMMITTER_EMAIL"):
+        monkeypatch.setenv(var, "test@example.com")
+    _git(tmp_path, "init", "-q")
+    return tmp_path
+
+
+def _commit(repo, files):
+    for name, data in files.items():
+        path = repo / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    _git(repo, "add", "-A")
+    _git(repo, "commit", "-q", "-m", "init")
+
+
+def test_non_utf8_blob_is_skipped_and_the_rest_pinned(repo):
+    bad = ACTION.encode() + b"# caf\xe9\n"
+    _commit(repo, {"good/action.yml": ACTION.encode(), "bad/action.yml": bad})
+
+    result = pin_repo(str(repo / ".git"), RULES)
+
+    assert result.error is None
+    assert result.unreadable == ["bad/action.yml"]
+    assert result.files == [("good/action.yml", 1)]
+    pinned = _git(repo, "show", "fix-shas/pin:good/action.yml").decode()
+    assert f"actions/checkout@{SHA} # v6.3.0" in pinned
+    assert _git(repo, "show", "fix-shas/pin:bad/action.yml") == bad
+
+
+@pytest.mark.parametrize("directory", ['"quoted', "new\nline", "tab\there"])
+def test_special_paths_are_committed_verbatim(repo, directory):
+    _commit(repo, {f"{directory}/action.yml": ACTION.encode()})
+
+    result = pin_repo(str(repo / ".git"), RULES)
+
+    assert result.files == [(f"{directory}/action.yml", 1)]
+    names = _git(repo, "ls-tree", "-r", "-z", "--name-only", "fix-shas/pin").split(b"\0")
+    assert [n for n in names if n] == [f"{directory}/action.yml".encode()]
@@ -0,0 +1,35 @@
+"""Tests for the incremental usage index in :mod:`pinning.index`."""
+
+from __future__ import annotations
+
+from pinning.fleet import Root
+from pinning.index import PINNED, UsageIndex
+from pinning.rules import PinRules
+
+SHA = "a" * 40
+RULES = PinRules({"actions/checkout": SHA})
+
+
+def test_update_skips_non_utf8_workflows(tmp_path):
+    workflows = tmp_path / "repo" / ".github" / "workflows"
+    workflows.mkdir(parents=True)
+    (workflows / "good.yml").write_text(f"steps:\n  - uses: actions/checkout@{SHA}\n")
+    bad = workflows / "bad.yml"
+    bad.write_bytes(f"steps:\n  - uses: actions/checkout@{SHA} # caf".encode() + b"\xe9\n")
+    roots = [Root("repo", str(tmp_path / "repo"))]
+
+    with UsageIndex(str(tmp_path / "uses.sqlite")) as index:
+        stats = index.update(roots, RULES)
+        assert stats["seen"] == 2
+        assert stats["extracted"] == 1
+        assert stats["unreadable"] == 1
+        [usage] = index.query(action="actions/checkout")
+        assert usage.path.endswith("good.yml")
+        assert usage.state == PINNED
+
+        # Still unreadable next time, and picked up once it is fixed.
+        assert index.update(roots, RULES)["unreadable"] == 1
+        bad.write_text(f"steps:\n  - uses: actions/checkout@{SHA}\n")
+        stats = index.update(roots, RULES)
+        assert stats["unreadable"] == 0
+        assert len(index.query(action="actions/checkout")) == 2
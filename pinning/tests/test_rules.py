@@ -0,0 +1,101 @@
+"""Tests for the single-pass pin table in :mod:`pinning.rules`."""
+
+from __future__ import annotations
+
+import pytest
+
+from pinning.lockfile import RefCache
+from pinning.rules import PinRules
+from pinning.stream import pin_text
+
+LOCKED = "a" * 40  # actions/checkout, locked at v6.3.0
+OTHER = "b" * 40  # actions/checkout v4
+PYTHON = "c" * 40  # actions/setup-python, locked by SHA only
+UNLOCKED = "d" * 40  # some-org/some-action v1, not in the lock
+STALE = "0" * 40
+
+
+@pytest.fixture
+def rules(tmp_path):
+    (tmp_path / "actions").mkdir()
+    (tmp_path / "actions" / "checkout.refs").write_text(
+        f"{LOCKED}\trefs/tags/v6.3.0\n{LOCKED}\trefs/tags/v6\n{OTHER}\trefs/tags/v4\n"
+    )
+    (tmp_path / "some-org").mkdir()
+    (tmp_path / "some-org" / "some-action.refs").write_text(f"{UNLOCKED}\trefs/tags/v1\n")
+    return PinRules(
+        {"actions/checkout": LOCKED, "actions/setup-python": PYTHON},
+        {"actions/checkout": "v6.3.0"},
+        RefCache(str(tmp_path)),
+    )
+
+
+@pytest.mark.parametrize(
+    "line, expected, changed",
+    [
+        # The locked ref, and another tag naming the locked commit.
+        ("uses: actions/checkout@v6.3.0", f"uses: actions/checkout@{LOCKED} # v6.3.0", 1),
+        ("uses: actions/checkout@v6", f"uses: actions/checkout@{LOCKED} # v6.3.0", 1),
+        # A tag naming another commit, or none the ref cache knows, is held.
+        ("uses: actions/checkout@v4", "uses: actions/checkout@v4", 0),
+        ("uses: actions/checkout@v9 # v9", "uses: actions/checkout@v9 # v9", 0),
+        ("uses: actions/setup-python@v5", "uses: actions/setup-python@v5", 0),
+        # Stale SHAs move to the lock; a label is replaced or, without a
+        # locked ref, dropped. Longer comments are kept.
+        (f"uses: actions/checkout@{STALE} # v5", f"uses: actions/checkout@{LOCKED} # v6.3.0", 1),
+        (f"uses: actions/setup-python@{STALE} # v4", f"uses: actions/setup-python@{PYTHON}", 1),
+        (
+            f"uses: actions/setup-python@{STALE} # keep this",
+            f"uses: actions/setup-python@{PYTHON} # keep this",
+            1,
+        ),
+        (f"uses: actions/checkout@{LOCKED} # v6.3.0", f"uses: actions/checkout@{LOCKED} # v6.3.0", 0),
+        # Quoted references keep their quotes.
+        ('uses: "actions/checkout@v6.3.0"', f'uses: "actions/checkout@{LOCKED}" # v6.3.0', 1),
+        ("uses: 'actions/checkout@v6'", f"uses: 'actions/checkout@{LOCKED}' # v6.3.0", 1),
+        # An existing label comment is updated in place.
+        ("uses: actions/checkout@v6  #  old", f"uses: actions/checkout@{LOCKED}  #  v6.3.0", 1),
+        # Sub-path actions fall back to their repo's pin.
+        ("uses: actions/checkout/sub@v6.3.0", f"uses: actions/checkout/sub@{LOCKED} # v6.3.0", 1),
+        # Unlocked actions get the SHA their own ref resolves to.
+        ("uses: some-org/some-action@v1", f"uses: some-org/some-action@{UNLOCKED} # v1", 1),
+        ("uses: some-org/some-action@v2", "uses: some-org/some-action@v2", 0),
+    ],
+)
+def test_rewrite(rules, line, expected, changed):
+    assert rules.rewrite(line) == (expected, changed)
+
+
+@pytest.mark.parametrize(
+    "line, drift",
+    [
+        ("uses: actions/checkout@v6.3.0", [("actions/checkout", "v6.3.0", LOCKED)]),
+        ("uses: actions/checkout@v4", [("actions/checkout", "v4", LOCKED)]),
+        ("uses: actions/setup-python@v5", [("actions/setup-python", "v5", PYTHON)]),
+        (f"uses: actions/checkout@{STALE}", [("actions/checkout", STALE, LOCKED)]),
+        (f"uses: actions/checkout@{LOCKED} # v6.3.0", []),
+        ("uses: some-org/some-action@v1", [("some-org/some-action", "v1", UNLOCKED)]),
+        ("uses: some-org/some-action@v2", []),
+    ],
+)
+def test_drift(rules, line, drift):
+    assert list(rules.drift(line)) == drift
+
+
+def test_rewrite_whole_workflow_counts_each_reference(rules):
+    text = (
+        "steps:\n"
+        "  - uses: actions/checkout@v6.3.0\n"
+        "  - uses: actions/checkout@v4\n"
+        f"  - uses: actions/setup-python@{STALE}\n"
+    )
+    new, changed = rules.rewrite(text)
+    assert changed == 2
+    assert "actions/checkout@v4\n" in new
+    assert new.count(LOCKED) == 1
+
+
+def test_empty_table_is_not_replaced_by_defaults():
+    text = f"uses: actions/checkout@{STALE}"
+    assert pin_text(text, PinRules({})) == (text, 0)
+    assert pin_text(text)[1] == 1  # no table at all: the defaults
@@ -0,0 +1,59 @@
+"""Tests for planning edits in :mod:`pinning.scanner`."""
+
+from __future__ import annotations
+
+from pinning.rules import PinRules
+from pinning.scanner import PlanCache, plan_file
+
+SHA = "a" * 40
+STALE = "0" * 40
+RULES = PinRules({"actions/checkout": SHA}, {"actions/checkout": "v6.3.0"})
+
+
+def test_plan_edits_only_uses_lines(tmp_path):
+    path = tmp_path / "ci.yml"
+    path.write_text(f"name: ci\nsteps:\n  - uses: actions/checkout@{STALE}\n  - run: echo\n")
+    plan = plan_file(str(path), RULES)
+    assert plan.changed == 1
+    assert plan.fingerprint is None
+    [edit] = plan.edits
+    data = path.read_bytes()
+    assert data[edit.start:edit.end] == f"  - uses: actions/checkout@{STALE}".encode()
+    assert edit.line == f"  - uses: actions/checkout@{SHA} # v6.3.0".encode()
+
+
+def test_plan_clean_file_is_fingerprinted(tmp_path):
+    path = tmp_path / "ci.yml"
+    path.write_text(f"steps:\n  - uses: actions/checkout@{SHA} # v6.3.0\n")
+    plan = plan_file(str(path), RULES)
+    assert plan.edits == ()
+    assert plan.fingerprint is not None
+    assert not plan.unreadable
+
+
+def test_plan_non_utf8_file_is_unreadable(tmp_path):
+    path = tmp_path / "ci.yml"
+    path.write_bytes(f"steps:\n  - uses: actions/checkout@{STALE} # caf".encode() + b"\xe9\n")
+    plan = plan_file(str(path), RULES, PlanCache())
+    assert plan.unreadable
+    assert plan.edits == ()
+    assert plan.fingerprint is None
+
+
+def test_plan_held_reference_is_counted(tmp_path):
+    path = tmp_path / "ci.yml"
+    path.write_text("steps:\n  - uses: actions/checkout@v4\n")
+    plan = plan_file(str(path), RULES)
+    assert plan.edits == ()
+    assert plan.held == 1
+
+
+def test_plan_cache_reuses_identical_content(tmp_path):
+    cache = PlanCache()
+    for name in ("a.yml", "b.yml"):
+        (tmp_path / name).write_text(f"  - uses: actions/checkout@{STALE}\n")
+    first = plan_file(str(tmp_path / "a.yml"), RULES, cache)
+    second = plan_file(str(tmp_path / "b.yml"), RULES, cache)
+    assert not first.reused
+    assert second.reused
+    assert second.edits == first.edits
@@ -0,0 +1,81 @@
+"""Tests for the batched write-back in :mod:`pinning.writeback`."""
+
+from __future__ import annotations
+
+import os
+
+from pinning.rules import PinRules
+from pinning.scanner import plan_file
+from pinning.writeback import WriteBack, pin_mapped
+
+SHA = "a" * 40
+STALE = "0" * 40
+RULES = PinRules({"actions/checkout": SHA}, {"actions/checkout": "v6.3.0"})
+WORKFLOW = f"steps:\n  - uses: actions/checkout@{STALE}\n  - run: echo\n"
+PINNED = f"steps:\n  - uses: actions/checkout@{SHA} # v6.3.0\n  - run: echo\n"
+
+
+def _write(path, text, mtime_ns):
+    path.write_text(text)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_commit_rewrites_planned_files(tmp_path):
+    path = tmp_path / "ci.yml"
+    path.write_text(WORKFLOW)
+    writeback = WriteBack(fsync=False)
+    writeback.add(plan_file(str(path), RULES))
+    result = writeback.commit()
+    assert path.read_text() == PINNED
+    assert result.conflicts == []
+    assert result.written[str(path)].size == len(PINNED)
+    assert len(writeback) == 0
+
+
+def test_file_changed_before_commit_is_a_conflict(tmp_path):
+    path = tmp_path / "ci.yml"
+    other = tmp_path / "other.yml"
+    path.write_text(WORKFLOW)
+    other.write_text(WORKFLOW)
+    writeback = WriteBack(fsync=False)
+    writeback.add(plan_file(str(path), RULES))
+    writeback.add(plan_file(str(other), RULES))
+
+    edited = WORKFLOW + "  - run: edited\n"
+    path.write_text(edited)
+    result = writeback.commit()
+
+    assert result.conflicts == [str(path)]
+    assert path.read_text() == edited
+    assert other.read_text() == PINNED
+    assert sorted(os.listdir(tmp_path)) == ["ci.yml", "other.yml"]
+
+
+def test_file_changed_after_staging_is_a_conflict(tmp_path, monkeypatch):
+    path = tmp_path / "ci.yml"
+    _write(path, WORKFLOW, 1_000_000_000)
+    writeback = WriteBack(fsync=False)
+    writeback.add(plan_file(str(path), RULES))
+
+    stage = WriteBack._stage
+
+    def stage_then_edit(self, plan):
+        staged = stage(self, plan)
+        _write(path, WORKFLOW, 2_000_000_000)  # same size, new mtime
+        return staged
+
+    monkeypatch.setattr(WriteBack, "_stage", stage_then_edit)
+    result = writeback.commit()
+
+    assert result.conflicts == [str(path)]
+    assert result.written == {}
+    assert path.read_text() == WORKFLOW
+    assert os.listdir(tmp_path) == ["ci.yml"]
+
+
+def test_pin_mapped_returns_fingerprint_of_clean_file(tmp_path):
+    path = tmp_path / "ci.yml"
+    path.write_text(PINNED)
+    changed, fingerprint = pin_mapped(str(path), RULES)
+    assert changed == 0
+    assert fingerprint.size == len(PINNED)
@@ -0,0 +1,290 @@
+"""Long-running watch mode that re-pins workflows as they are saved.
+
+The pin table is compiled once and every file's fingerprint is kept in
+memory, so an edit costs one plan and one write-back of that file only. On
+Linux the watcher subscribes to inotify events on every directory under the
+roots; elsewhere it falls back to polling ``stat`` of the known targets.
+
+Events are debounced: a batch is processed once no new event has arrived for
+``debounce`` seconds (or ``2 * debounce`` after the first one, whichever is
+sooner), so an editor's write-rename-chmod burst is pinned once, well under
+50 ms after the save. The watcher's own write-back is recognised by its
+fingerprint and does not trigger another pass.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+from pinning.files import SKIP_DIRS, find_targets, is_target
+from pinning.fleet import Root
+from pinning.manifest import Fingerprint
+from pinning.rules import PinRules
+from pinning.scanner import plan_file
+from pinning.writeback import WriteBack
+
+DEFAULT_DEBOUNCE = 0.02
+POLL_INTERVAL = 0.1
+
+# From <sys/inotify.h>.
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_ONLYDIR
+EVENT = struct.Struct("iIII")
+
+
+@dataclass(frozen=True)
+class WatchResult:
+    """One file handled by the watcher."""
+
+    path: str
+    #: References rewritten, or 0 if the file was already pinned.
+    changed: int
+    #: Time from the first event of the batch to the file being committed.
+    latency: float
+    conflict: bool = False
+    #: Drifted references left as they are (see :attr:`~pinning.scanner.FilePlan.held`).
+    held: int = 0
+
+
+def _walk_dirs(root: str) -> Iterable[str]:
+    for dirpath, dirnames, _ in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        yield dirpath
+
+
+class InotifySource:
+    """Changed target paths reported by inotify (Linux only)."""
+
+    def __init__(self, roots: Iterable[str]) -> None:
+        libc_name = ctypes.util.find_library("c")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.roots = list(roots)
+        self.dirs: dict[int, str] = {}
+        for root in self.roots:
+            self.add_tree(root)
+
+    def add_tree(self, top: str) -> list[str]:
+        """Watch ``top`` and its subdirectories; return targets already there."""
+        found = []
+        for d in _walk_dirs(top):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(d), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err in (errno.ENOENT, errno.ENOTDIR):
+                    continue
+                raise OSError(err, f"inotify_add_watch {d}: {os.strerror(err)}")
+            self.dirs[wd] = d
+            found += (os.path.join(d, n) for n in os.listdir(d) if is_target(os.path.join(d, n)))
+        return found
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def changes(self, timeout: float | None) -> set[str]:
+        """Wait up to ``timeout`` seconds and return the targets that changed."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        changed: set[str] = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT.unpack_from(data, offset)
+            offset += EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0").decode("utf-8", "surrogateescape")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                for root in self.roots:
+                    changed.update(find_targets(root))
+                continue
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            parent = self.dirs.get(wd)
+            if parent is None or not name:
+                continue
+            path = os.path.join(parent, name)
+            if mask & IN_ISDIR:
+                if name not in SKIP_DIRS:
+                    changed.update(self.add_tree(path))
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and is_target(path):
+                changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class PollingSource:
+    """Changed target paths found by polling ``stat`` (portable fallback)."""
+
+    def __init__(self, roots: Iterable[str], interval: float = POLL_INTERVAL) -> None:
+        self.roots = list(roots)
+        self.interval = interval
+        self.stats = self._scan()
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        stats = {}
+        for root in self.roots:
+            for path in find_targets(root):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                stats[path] = (st.st_size, st.st_mtime_ns)
+        return stats
+
+    def changes(self, timeout: float | None) -> set[str]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            current = self._scan()
+            changed = {p for p, st in current.items() if self.stats.get(p) != st}
+            self.stats = current
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            wait = self.interval if deadline is None else min(self.interval, deadline - time.monotonic())
+            time.sleep(max(0.0, wait))
+
+    def close(self) -> None:
+        pass
+
+
+def open_source(roots: Iterable[str], polling: bool = False) -> InotifySource | PollingSource:
+    """inotify where the platform has it, polling otherwise."""
+    roots = list(roots)
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifySource(roots)
+        except (OSError, AttributeError):
+            pass
+    return PollingSource(roots)
+
+
+class Watcher:
+    """Keeps rules and fingerprints warm and pins files as they change.
+
+    Args:
+        roots: Trees to watch.
+        rules: Pin table, compiled once for the life of the watcher.
+        debounce: Quiet period, in seconds, that ends a batch of events.
+        polling: Force the ``stat`` polling fallback.
+        fsync: Passed to each :class:`~pinning.writeback.WriteBack`.
+    """
+
+    def __init__(
+        self,
+        roots: Iterable[Root],
+        rules: PinRules,
+        debounce: float = DEFAULT_DEBOUNCE,
+        polling: bool = False,
+        fsync: bool = True,
+    ) -> None:
+        self.rules = rules
+        self.debounce = debounce
+        self.fsync = fsync
+        #: Last known fingerprint of every pinned file, so the watcher's own
+        #: writes (and saves that change nothing) are recognised cheaply.
+        self.fingerprints: dict[str, Fingerprint] = {}
+        self.source = open_source((r.path for r in roots), polling=polling)
+
+    def close(self) -> None:
+        self.source.close()
+
+    def __enter__(self) -> Watcher:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def _known(self, path: str) -> bool:
+        entry = self.fingerprints.get(path)
+        if entry is None:
+            return False
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return st.st_size == entry.size and st.st_mtime_ns == entry.mtime_ns
+
+    def pin(self, paths: Iterable[str], started: float | None = None) -> list[WatchResult]:
+        """Pin ``paths`` now, skipping any whose fingerprint is unchanged."""
+        started = time.perf_counter() if started is None else started
+        writeback = WriteBack(fsync=self.fsync)
+        plans = []
+        for path in sorted(paths):
+            if self._known(path):
+                continue
+            try:
+                plan = plan_file(path, self.rules)
+            except FileNotFoundError:
+                plan = None
+            if plan is None or plan.unreadable:
+                self.fingerprints.pop(path, None)
+                continue
+            if plan.fingerprint is not None:
+                self.fingerprints[path] = plan.fingerprint
+            else:
+                writeback.add(plan)
+            plans.append(plan)
+        committed = writeback.commit()
+        self.fingerprints.update(committed.written)
+        conflicts = set(committed.conflicts)
+        latency = time.perf_counter() - started
+        return [
+            WatchResult(p.path, 0 if p.path in conflicts else p.changed, latency,
+                        p.path in conflicts, p.held)
+            for p in plans
+        ]
+
+    def step(self, timeout: float | None = None) -> list[WatchResult]:
+        """Wait for one debounced batch of changes and pin it.
+
+        Returns an empty list if ``timeout`` expires with no relevant change.
+        """
+        pending = self.source.changes(timeout)
+        if not pending:
+            return []
+        started = time.perf_counter()
+        limit = started + 2 * self.debounce
+        while True:
+            remaining = limit - time.perf_counter()
+            if remaining <= 0:
+                break
+            more = self.source.changes(min(self.debounce, remaining))
+            if not more:
+                break
+            pending |= more
+        return self.pin(pending, started)
+
+    def run(self, on_result: Callable[[WatchResult], None]) -> None:
+        """Pin changes forever, reporting each handled file to ``on_result``."""
+        while True:
+            for result in self.step():
+                on_result(result)
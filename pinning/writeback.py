@@ -0,0 +1,176 @@
+"""Batched, atomic write-back of planned pin edits.
+
+Edits for every file are planned first (read-only, possibly in worker
+processes) and committed together by the parent:
+
+1. each file is streamed with its edits spliced in to a sibling temp file,
+   and the temp files are flushed to disk;
+2. only once every temp file exists are they renamed over their originals;
+3. each touched directory is synced once.
+
+A failure before step 2 removes every temp file and leaves all workflows
+untouched. A file whose ``stat`` changed since it was planned (for example
+because another run pinned it concurrently) is reported as a conflict and
+left alone rather than overwritten with stale edits.
+"""
+
+from __future__ import annotations
+
+import difflib
+import hashlib
+import mmap
+import os
+import tempfile
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, TextIO
+
+from pinning.manifest import Fingerprint
+from pinning.rules import PinRules
+from pinning.scanner import Edit, FilePlan, plan_file
+
+
+def splice(data: memoryview | bytes, edits: Iterable[Edit]) -> Iterator[memoryview | bytes]:
+    """Yield the chunks of ``data`` with ``edits`` applied, without joining them."""
+    view = memoryview(data)
+    prev = 0
+    for edit in edits:
+        yield view[prev:edit.start]
+        yield edit.line
+        prev = edit.end
+    yield view[prev:]
+
+
+def _unchanged(plan: FilePlan, st: os.stat_result) -> bool:
+    return st.st_size == plan.size and st.st_mtime_ns == plan.mtime_ns
+
+
+@dataclass
+class CommitResult:
+    """Outcome of :meth:`WriteBack.commit`."""
+
+    #: New fingerprint of every file that was rewritten.
+    written: dict[str, Fingerprint] = field(default_factory=dict)
+    #: Files that changed on disk after they were planned.
+    conflicts: list[str] = field(default_factory=list)
+
+
+class WriteBack:
+    """Collects :class:`FilePlan` edits and commits them all at once.
+
+    Args:
+        fsync: Flush temp files and directories to disk before and after
+            the renames. Disable only for throwaway trees such as benchmarks.
+    """
+
+    def __init__(self, fsync: bool = True) -> None:
+        self.fsync = fsync
+        self.plans: list[FilePlan] = []
+
+    def __len__(self) -> int:
+        return len(self.plans)
+
+    def add(self, plan: FilePlan) -> None:
+        if plan.edits:
+            self.plans.append(plan)
+
+    def diff(self, out: TextIO) -> int:
+        """Stream a unified diff of every pending edit to ``out``.
+
+        Returns:
+            The number of files in the diff.
+        """
+        for plan in self.plans:
+            with open(plan.path, "rb") as f:
+                old = f.read()
+            new = b"".join(splice(old, plan.edits))
+            name = os.path.relpath(plan.path)
+            if name.startswith(os.pardir):
+                name = plan.path.lstrip(os.sep)
+            out.writelines(difflib.unified_diff(
+                old.decode("utf-8").splitlines(keepends=True),
+                new.decode("utf-8").splitlines(keepends=True),
+                fromfile=f"a/{name}",
+                tofile=f"b/{name}",
+            ))
+        return len(self.plans)
+
+    def _stage(self, plan: FilePlan) -> tuple[str, str] | None:
+        """Write ``plan`` to a temp file; return ``(tmp, sha256)`` or None on conflict."""
+        with open(plan.path, "rb") as f:
+            st = os.fstat(f.fileno())
+            if not _unchanged(plan, st):
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                digest = hashlib.sha256()
+                fd, tmp = tempfile.mkstemp(prefix=".fix-shas.", dir=os.path.dirname(plan.path) or ".")
+                try:
+                    with os.fdopen(fd, "wb") as out:
+                        for chunk in splice(buf, plan.edits):
+                            out.write(chunk)
+                            digest.update(chunk)
+                            if isinstance(chunk, memoryview):
+                                chunk.release()
+                        if self.fsync:
+                            out.flush()
+                            os.fsync(out.fileno())
+                    os.chmod(tmp, st.st_mode & 0o7777)
+                except BaseException:
+                    os.unlink(tmp)
+                    raise
+        return tmp, digest.hexdigest()
+
+    def commit(self) -> CommitResult:
+        """Atomically replace every planned file with its edited version."""
+        result = CommitResult()
+        staged: list[tuple[FilePlan, str, str]] = []
+        try:
+            for plan in self.plans:
+                outcome = self._stage(plan)
+                if outcome is None:
+                    result.conflicts.append(plan.path)
+                else:
+                    staged.append((plan, *outcome))
+        except BaseException:
+            for _, tmp, _ in staged:
+                os.unlink(tmp)
+            raise
+
+        dirs = set()
+        for plan, tmp, digest in staged:
+            if not _unchanged(plan, os.stat(plan.path)):
+                os.unlink(tmp)
+                result.conflicts.append(plan.path)
+                continue
+            os.replace(tmp, plan.path)
+            dirs.add(os.path.dirname(plan.path) or ".")
+            st = os.stat(plan.path)
+            result.written[plan.path] = Fingerprint(st.st_size, st.st_mtime_ns, digest)
+
+        if self.fsync:
+            for d in sorted(dirs):
+                fd = os.open(d, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+        self.plans = []
+        return result
+
+
+def pin_mapped(path: str, rules: PinRules) -> tuple[int, Fingerprint]:
+    """Plan and atomically commit the pinning of a single file.
+
+    Returns:
+        The number of references changed and the file's new fingerprint.
+    """
+    plan = plan_file(path, rules)
+    if plan.unreadable:
+        raise ValueError(f"{path} is not valid UTF-8")
+    if plan.fingerprint is not None:
+        return 0, plan.fingerprint
+    writeback = WriteBack()
+    writeback.add(plan)
+    result = writeback.commit()
+    if path in result.conflicts:
+        raise RuntimeError(f"{path} changed while it was being pinned")
+    return plan.changed, result.written[path]
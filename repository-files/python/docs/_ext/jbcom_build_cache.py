@@ -0,0 +1,318 @@
+"""Restore the Sphinx environment and doctrees from a content-addressed cache.
+
+Synced from jbcom-control-center as part of the Python docs kit.
+
+After a successful build the doctree directory (``environment.pickle`` and
+every ``.doctree``) is archived in the cache under a key made of:
+
+* the docs source directory, since Sphinx refuses to load an environment
+  pickled for another one,
+* the hash of the environment-level config values (see ``jbcom_config``)
+  and of the kit's ``_ext`` modules,
+* the hash of the dependency lock (``uv.lock``),
+* the hash of every documentation source and of every file under
+  ``jbcom_build_cache_sources`` (the package source, or every workspace
+  package's).
+
+A build that starts without an environment (a fresh CI checkout, or after
+``make clean``) restores the entry with the same key or, failing that, the
+one with the same config and lock whose sources match best. Sphinx decides
+what to re-read by modification time, which a fresh checkout resets, so
+every document whose source and recorded dependencies still hash the same
+as when the entry was made is marked up to date; only the rest is read
+again.
+
+The cache lives in ``$JBCOM_BUILD_CACHE`` (``~/.cache/jbcom-docs/builds`` by
+default), which CI can persist between runs. Entries unused for
+``jbcom_build_cache_max_age`` days are evicted, then the least recently
+used ones until the cache fits in ``jbcom_build_cache_max_bytes``.
+"""
+
+import hashlib
+import json
+import os
+import tarfile
+import time
+
+from sphinx.util import logging
+
+from jbcom_config import config_snapshot
+from jbcom_workspace import source_dirs
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.environ.get("JBCOM_BUILD_CACHE") or os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+    "jbcom-docs", "builds",
+)
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+DEFAULT_MAX_AGE_DAYS = 30
+ENV_PICKLE = "environment.pickle"
+SKIP_DIRS = {"_build", "__pycache__", ".git", ".cache"}
+
+try:
+    from sphinx.util.osutil import _last_modified_time
+except ImportError:  # Sphinx < 7.3 records mtimes as float seconds
+    _last_modified_time = os.path.getmtime
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def tree_hashes(root, prefix):
+    """``{prefix/relative path: sha256}`` for every file under ``root``."""
+    hashes = {}
+    if not root or not os.path.isdir(root):
+        return hashes
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS)
+        for name in filenames:
+            if name.endswith((".pyc", ".tmp")):
+                continue
+            path = os.path.join(dirpath, name)
+            rel = os.path.relpath(path, root).replace(os.sep, "/")
+            hashes[f"{prefix}/{rel}"] = file_hash(path)
+    return hashes
+
+
+def _combined(hashes):
+    digest = hashlib.sha256()
+    for name in sorted(hashes):
+        digest.update(f"{name}={hashes[name]}\n".encode())
+    return digest.hexdigest()
+
+
+def _roots(app):
+    """Labelled roots of everything hashed, so source hashes hold no absolute paths."""
+    roots = {"docs": str(app.srcdir)}
+    repo = os.path.dirname(os.path.abspath(str(app.confdir)))
+    # Labelled by their place in the repo ("src", "packages/a/src"), so
+    # adding a workspace member leaves the other members' hashes alone.
+    for source in source_dirs(app.config.jbcom_build_cache_sources):
+        roots[os.path.relpath(source, repo).replace(os.sep, "/")] = source
+    return roots
+
+
+def snapshot(app):
+    """``(base key, full key, source hashes)`` for the current tree."""
+    config = app.config
+    # The config values, not conf.py's text: comments and HTML-only
+    # settings do not invalidate the cached environment.
+    base = {"config": _combined(config_snapshot(app, doctrees_only=True))}
+    # A checkout elsewhere cannot reuse the environment: Sphinx discards
+    # one whose srcdir differs and reads everything again.
+    base["srcdir"] = os.path.abspath(str(app.srcdir))
+    base.update(tree_hashes(os.path.join(str(app.confdir), "_ext"), "_ext"))
+    lock = config.jbcom_build_cache_lock
+    if lock and os.path.isfile(lock):
+        base["lock"] = file_hash(lock)
+    sources = {}
+    for label, root in _roots(app).items():
+        sources.update(tree_hashes(root, label))
+    base_key = _combined(base)
+    return base_key, _combined({"base": base_key, **sources}), sources
+
+
+class BuildCache:
+    """Directory of archived doctree directories with JSON manifests."""
+
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+
+    def _path(self, key, suffix):
+        return os.path.join(self.root, f"{key}{suffix}")
+
+    def manifests(self):
+        if not os.path.isdir(self.root):
+            return []
+        found = []
+        for name in os.listdir(self.root):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.root, name)) as f:
+                    found.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return found
+
+    def best(self, base_key, key, sources):
+        """Manifest to restore: the exact key, else the closest with the same base."""
+        candidates = [m for m in self.manifests() if m.get("base") == base_key
+                      and os.path.exists(self._path(m["key"], ".tar"))]
+        for manifest in candidates:
+            if manifest["key"] == key:
+                return manifest
+
+        def score(manifest):
+            stored = manifest.get("sources", {})
+            same = sum(1 for name, h in sources.items() if stored.get(name) == h)
+            return same, manifest.get("used", 0)
+
+        return max(candidates, key=score, default=None)
+
+    def restore(self, manifest, doctreedir):
+        with tarfile.open(self._path(manifest["key"], ".tar")) as tar:
+            members = [m for m in tar.getmembers()
+                       if m.isfile() and not os.path.isabs(m.name) and ".." not in m.name.split("/")]
+            # Python 3.12+ warns unless an extraction filter is given.
+            safe = {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+            tar.extractall(doctreedir, members=members, **safe)
+        manifest["used"] = time.time()
+        self._write_manifest(manifest)
+
+    def save(self, manifest, doctreedir):
+        tar_path = self._path(manifest["key"], ".tar")
+        os.makedirs(self.root, exist_ok=True)
+        tmp = f"{tar_path}.{os.getpid()}.tmp"
+        with tarfile.open(tmp, "w") as tar:
+            tar.add(doctreedir, arcname=".")
+        os.replace(tmp, tar_path)
+        manifest["size"] = os.path.getsize(tar_path)
+        manifest["used"] = time.time()
+        self._write_manifest(manifest)
+
+    def _write_manifest(self, manifest):
+        path = self._path(manifest["key"], ".json")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, sort_keys=True)
+        os.replace(tmp, path)
+
+    def _remove(self, key):
+        for suffix in (".json", ".tar"):
+            try:
+                os.remove(self._path(key, suffix))
+            except FileNotFoundError:
+                pass
+
+    def prune(self):
+        """Evict entries older than the age limit, then LRU entries to fit; return count."""
+        now = time.time()
+        manifests = sorted(self.manifests(), key=lambda m: m.get("used", 0))
+        removed = 0
+        kept = []
+        for manifest in manifests:
+            if now - manifest.get("used", 0) > self.max_age:
+                self._remove(manifest["key"])
+                removed += 1
+            else:
+                kept.append(manifest)
+        total = sum(m.get("size", 0) for m in kept)
+        for manifest in kept:
+            if total <= self.max_bytes:
+                break
+            self._remove(manifest["key"])
+            total -= manifest.get("size", 0)
+            removed += 1
+        return removed
+
+
+def _cache(config):
+    return BuildCache(
+        config.jbcom_build_cache_dir,
+        config.jbcom_build_cache_max_bytes,
+        config.jbcom_build_cache_max_age,
+    )
+
+
+def restore(app, config):
+    """Unpack a cached doctree directory before Sphinx loads the environment."""
+    app._jbcom_build_cache = None
+    if not config.jbcom_build_cache:
+        return
+    doctreedir = str(app.doctreedir)
+    if os.path.exists(os.path.join(doctreedir, ENV_PICKLE)):
+        return  # a local incremental build needs no help
+    base_key, key, sources = snapshot(app)
+    manifest = _cache(config).best(base_key, key, sources)
+    if manifest is None:
+        return
+    _cache(config).restore(manifest, doctreedir)
+    app._jbcom_build_cache = manifest
+    exact = "exact match" if manifest["key"] == key else "closest match"
+    logger.info("jbcom_build_cache: restored environment %s (%s)", manifest["key"][:12], exact)
+
+
+def mark_unchanged(app):
+    """Mark restored documents whose inputs hash the same as up to date."""
+    manifest = getattr(app, "_jbcom_build_cache", None)
+    env = app.env
+    if manifest is None or getattr(app, "_fresh_env_used", True):
+        return
+    roots = _roots(app)
+    stored = manifest.get("sources", {})
+    labels = sorted(((root, label) for label, root in roots.items() if root),
+                    key=lambda item: -len(item[0]))
+
+    def unchanged(path):
+        path = os.path.abspath(str(path))
+        for root, label in labels:
+            if path.startswith(os.path.join(root, "")):
+                name = f"{label}/" + os.path.relpath(path, root).replace(os.sep, "/")
+                return os.path.isfile(path) and stored.get(name) == file_hash(path)
+        # Outside the hashed trees: installed packages, which the lock in
+        # the base key already pins.
+        return os.path.isfile(path)
+
+    fresh = 0
+    for docname in list(env.all_docs):
+        try:
+            source = env.doc2path(docname)
+        except Exception:
+            continue
+        files = [source, *env.dependencies.get(docname, ())]
+        if all(unchanged(path) for path in files):
+            env.all_docs[docname] = max(_last_modified_time(str(path)) for path in files)
+            fresh += 1
+        else:
+            env.all_docs[docname] = 0
+    logger.info("jbcom_build_cache: %d of %d document(s) unchanged", fresh, len(env.all_docs))
+
+
+def save(app, exception):
+    """Archive the doctree directory of a successful build."""
+    if exception is not None or not app.config.jbcom_build_cache:
+        return
+    doctreedir = str(app.doctreedir)
+    if not os.path.exists(os.path.join(doctreedir, ENV_PICKLE)):
+        return
+    cache = _cache(app.config)
+    base_key, key, sources = snapshot(app)
+    if not os.path.exists(os.path.join(cache.root, f"{key}.tar")):
+        cache.save({
+            "key": key,
+            "base": base_key,
+            "project": app.config.project,
+            "created": time.time(),
+            "sources": sources,
+        }, doctreedir)
+    removed = cache.prune()
+    if removed:
+        logger.info("jbcom_build_cache: evicted %d cache entries", removed)
+
+
+def setup(app):
+    app.add_config_value("jbcom_build_cache", True, "")
+    app.add_config_value("jbcom_build_cache_dir", DEFAULT_CACHE_DIR, "")
+    app.add_config_value("jbcom_build_cache_sources", "", "", types=(str, list))
+    app.add_config_value("jbcom_build_cache_lock", "", "")
+    app.add_config_value("jbcom_build_cache_max_bytes", DEFAULT_MAX_BYTES, "")
+    app.add_config_value("jbcom_build_cache_max_age", DEFAULT_MAX_AGE_DAYS, "")
+    # After other config-inited handlers have filled in defaults (numfig_format).
+    app.connect("config-inited", restore, priority=900)
+    # After jbcom_apidoc has (re)written the API stubs.
+    app.connect("builder-inited", mark_unchanged, priority=900)
+    app.connect("build-finished", save, priority=900)
+    return {
+        "version": "1.0",
+        "parallel_read_safe": True,
+        "parallel_write_safe": True,
+    }
@@ -0,0 +1,331 @@
+"""Opt-in timing of a docs build: phases, documents and module imports.
+
+Synced from jbcom-control-center as part of the Python docs kit.
+
+Enable with ``make profile``, ``-D jbcom_profile=1`` or
+``JBCOM_DOCS_PROFILE=1``. The build then records:
+
+* phase timings: ``builder-inited`` (sphinx-apidoc and other setup),
+  ``read``, ``consistency``, ``resolve`` and ``write``;
+* per-document read, resolve and write time;
+* every module imported during the build (autodoc imports of the package
+  and whatever they pull in), with its own and cumulative import time and
+  the change in resident memory.
+
+Results are written to ``jbcom_profile_output`` (``_build/profile.json`` by
+default) and the ``jbcom_profile_top`` slowest items of each kind are
+printed when the build finishes.
+
+Per-document write times are only recorded for serial builds (``-j 1``,
+which ``make profile`` uses); parallel builds write in forked processes.
+
+Profiling turns off ``jbcom_build_cache`` and ``jbcom_autodoc_cache``:
+a restored environment skips reading and cached autodoc output skips the
+imports, which are the costs being measured.
+"""
+
+import importlib.abc
+import json
+import os
+import sys
+import time
+
+from sphinx.util import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOP = 10
+# Caches that would hide the read and import cost from the profile.
+CACHES = ("jbcom_build_cache", "jbcom_autodoc_cache")
+
+
+def rss_bytes():
+    """Current resident set size, or peak RSS where that is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _TimedLoader:
+    """Wraps a loader for the duration of one ``exec_module`` call."""
+
+    def __init__(self, loader, profiler):
+        self._loader = loader
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        profiler = self._profiler
+        frame = [module.__name__, time.perf_counter(), rss_bytes(), 0.0]
+        profiler.stack.append(frame)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            profiler.stack.pop()
+            # Leave no trace of the wrapper on the module.
+            module.__loader__ = self._loader
+            if getattr(module, "__spec__", None) is not None:
+                module.__spec__.loader = self._loader
+            elapsed = time.perf_counter() - frame[1]
+            if profiler.stack:
+                profiler.stack[-1][3] += elapsed
+            profiler.imports[module.__name__] = {
+                "cumulative": elapsed,
+                "self": elapsed - frame[3],
+                "rss_delta": rss_bytes() - frame[2],
+                "importer": profiler.stack[0][0] if profiler.stack else None,
+            }
+
+
+class ImportProfiler(importlib.abc.MetaPathFinder):
+    """Times every module imported while it is first on ``sys.meta_path``."""
+
+    def __init__(self):
+        self.imports = {}
+        self.stack = []
+        self._finding = set()
+
+    def find_spec(self, fullname, path=None, target=None):
+        if fullname in self._finding:
+            return None
+        self._finding.add(fullname)
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._finding.discard(fullname)
+        if spec.loader is None or not hasattr(spec.loader, "exec_module"):
+            return spec
+        spec.loader = _TimedLoader(spec.loader, self)
+        return spec
+
+    def install(self):
+        sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+
+class BuildProfile:
+    """Timings collected over one build."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.marks = {}
+        self.phases = {}
+        self.documents = {}
+        self.imports = ImportProfiler()
+        self.restore = None
+
+    def mark(self, name):
+        self.marks[name] = time.perf_counter()
+
+    def phase(self, name, start, end):
+        if start in self.marks and end in self.marks:
+            self.phases[name] = self.marks[end] - self.marks[start]
+
+    def document(self, docname, key, seconds):
+        entry = self.documents.setdefault(docname, {"read": 0.0, "resolve": 0.0, "write": 0.0})
+        entry[key] += seconds
+
+    def as_dict(self):
+        return {
+            "total": time.perf_counter() - self.started,
+            "phases": self.phases,
+            "documents": self.documents,
+            "imports": self.imports.imports,
+        }
+
+
+def _profile(app):
+    return getattr(app, "_jbcom_profile", None)
+
+
+def _timed(profile, key, method, docname_arg=0):
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            docname = args[docname_arg] if len(args) > docname_arg else kwargs.get("docname")
+            profile.document(docname, key, time.perf_counter() - started)
+    return wrapper
+
+
+def start(app, config):
+    if not config.jbcom_profile:
+        return
+    for name in CACHES:
+        if getattr(config, name, False):
+            setattr(config, name, False)
+            logger.info("jbcom_profile: %s disabled for this build", name)
+    profile = app._jbcom_profile = BuildProfile()
+    profile.imports.install()
+    profile.mark("config-inited")
+
+
+def builder_started(app):
+    profile = _profile(app)
+    if profile is not None:
+        # Go back in front of finders added since (jbcom_static's).
+        profile.imports.uninstall()
+        profile.imports.install()
+        profile.mark("builder-inited:start")
+
+
+def builder_ready(app):
+    profile = _profile(app)
+    if profile is None:
+        return
+    profile.mark("builder-inited:end")
+    profile.phase("builder-inited", "builder-inited:start", "builder-inited:end")
+    # The environment is pickled, so its method is wrapped on the class
+    # (and restored in finish()); the builder is not.
+    env_class = type(app.builder.env)
+    original = env_class.get_and_resolve_doctree
+    profile.restore = (env_class, original)
+    env_class.get_and_resolve_doctree = _timed(profile, "resolve", original, docname_arg=1)
+    app.builder.write_doc = _timed(profile, "write", app.builder.write_doc)
+
+
+def read_started(app, env, docnames):
+    profile = _profile(app)
+    if profile is not None:
+        profile.mark("read:start")
+        env.jbcom_profile_reads = {}
+
+
+def source_read(app, docname, source):
+    if _profile(app) is not None:
+        app.env.jbcom_profile_reading = (docname, time.perf_counter())
+
+
+def doctree_read(app, doctree):
+    env = app.env
+    reading = getattr(env, "jbcom_profile_reading", None)
+    if _profile(app) is None or reading is None:
+        return
+    # Each process reads one document at a time.
+    docname, started = reading
+    env.jbcom_profile_reading = None
+    reads = getattr(env, "jbcom_profile_reads", None)
+    if reads is None:
+        reads = env.jbcom_profile_reads = {}
+    reads[docname] = time.perf_counter() - started
+
+
+def merge_reads(app, env, docnames, other):
+    # Parallel reads: per-document timings come back from the workers.
+    if _profile(app) is not None:
+        env.jbcom_profile_reads.update(getattr(other, "jbcom_profile_reads", {}))
+
+
+def read_finished(app, env):
+    profile = _profile(app)
+    if profile is None:
+        return
+    profile.mark("read:end")
+    profile.phase("read", "read:start", "read:end")
+    for docname, seconds in getattr(env, "jbcom_profile_reads", {}).items():
+        profile.document(docname, "read", seconds)
+    # Keep the timings out of the pickled environment.
+    for attr in ("jbcom_profile_reads", "jbcom_profile_reading"):
+        if hasattr(env, attr):
+            delattr(env, attr)
+
+
+def consistency_checked(app, env):
+    profile = _profile(app)
+    if profile is not None:
+        profile.mark("consistency:end")
+        profile.phase("consistency", "read:end", "consistency:end")
+
+
+def _top(items, key, limit):
+    return sorted(items, key=key, reverse=True)[:limit]
+
+
+def finish(app, exception):
+    profile = _profile(app)
+    if profile is None:
+        return
+    profile.imports.uninstall()
+    if profile.restore is not None:
+        env_class, original = profile.restore
+        env_class.get_and_resolve_doctree = original
+    profile.mark("build-finished")
+    resolve = sum(d["resolve"] for d in profile.documents.values())
+    profile.phases["resolve"] = resolve
+    start = "consistency:end" if "consistency:end" in profile.marks else "read:end"
+    if start in profile.marks:
+        # Resolving happens document by document inside the write loop.
+        profile.phases["write"] = profile.marks["build-finished"] - profile.marks[start] - resolve
+
+    result = profile.as_dict()
+    output = app.config.jbcom_profile_output or os.path.join(
+        os.path.dirname(os.path.abspath(app.outdir)), "profile.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=1, sort_keys=True)
+
+    limit = app.config.jbcom_profile_top
+    lines = [f"build profile ({result['total']:.2f}s total), written to {output}"]
+    for name, seconds in result["phases"].items():
+        lines.append(f"  {name:<16} {seconds:8.2f}s")
+    documents = _top(result["documents"].items(), lambda item: sum(item[1].values()), limit)
+    if documents:
+        lines.append("  slowest documents (read / resolve / write):")
+        for docname, t in documents:
+            lines.append(f"    {t['read']:7.2f}s {t['resolve']:7.2f}s {t['write']:7.2f}s  {docname}")
+    imports = _top(result["imports"].items(), lambda item: item[1]["cumulative"], limit)
+    if imports:
+        lines.append("  slowest imports (cumulative / self / RSS delta):")
+        for name, t in imports:
+            lines.append(
+                f"    {t['cumulative']:7.2f}s {t['self']:7.2f}s "
+                f"{t['rss_delta'] / 2**20:8.1f} MiB  {name}"
+            )
+    logger.info("\n".join(lines))
+
+
+def setup(app):
+    app.add_config_value("jbcom_profile", bool(os.environ.get("JBCOM_DOCS_PROFILE")), "")
+    app.add_config_value("jbcom_profile_output", "", "")
+    app.add_config_value("jbcom_profile_top", DEFAULT_TOP, "")
+    # Bracket every other builder-inited handler (sphinx-apidoc runs there).
+    app.connect("config-inited", start, priority=1)
+    app.connect("builder-inited", builder_started, priority=1)
+    app.connect("builder-inited", builder_ready, priority=999)
+    app.connect("env-before-read-docs", read_started)
+    app.connect("source-read", source_read, priority=1)
+    app.connect("doctree-read", doctree_read, priority=999)
+    app.connect("env-merge-info", merge_reads)
+    app.connect("env-updated", read_finished, priority=1)
+    app.connect("env-check-consistency", consistency_checked, priority=999)
+    app.connect("build-finished", finish, priority=999)
+    return {
+        "version": "1.0",
+        "parallel_read_safe": True,
+        "parallel_write_safe": True,
+    }
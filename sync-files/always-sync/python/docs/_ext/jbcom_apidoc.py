@@ -0,0 +1,221 @@
+"""Generate the API stubs under docs/api on every build.
+
+Synced from jbcom-control-center as part of the Python docs kit.
+
+sphinx-apidoc runs in-process and only stubs whose text changed are written,
+so Sphinx keeps treating unchanged API pages as up to date. The step is
+skipped entirely while the module tree hash is unchanged.
+
+In workspace mode ``jbcom_apidoc_source`` lists several source directories
+(see ``jbcom_workspace``); apidoc runs once per directory and the stubs go
+into one API tree, with a single ``modules.rst`` listing every package.
+
+This is a real extension rather than a ``setup()`` in ``conf.py`` because
+Sphinx only reads parallel-safety metadata from extensions; with it, ``-j``
+builds run their read and write phases in parallel.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+import sphinx
+
+from jbcom_workspace import source_dirs
+
+# Suffixes sphinx-apidoc treats as modules
+APIDOC_SUFFIXES = (".py", ".pyi", ".pyx", ".so", ".pyd")
+
+# -M: put module documentation before submodule documentation
+# -e: put documentation for each module on its own page
+APIDOC_OPTIONS = ("--module-first", "--separate")
+
+
+def module_tree_hash(paths, options):
+    """Hash everything sphinx-apidoc output depends on.
+
+    The stubs only contain ``automodule`` directives, so they depend on the
+    module and package names under ``path`` (not on the code in them), on
+    whether each ``__init__.py`` is empty (apidoc skips empty packages), on
+    the apidoc options and on the Sphinx version. Adding, removing or
+    renaming a module changes the hash; editing one does not.
+    """
+    digest = hashlib.sha256()
+    digest.update(repr((sphinx.__version__, options, len(paths))).encode())
+    for index, path in enumerate(paths):
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = sorted(d for d in dirnames if d != "__pycache__" and not d.startswith("."))
+            for name in sorted(filenames):
+                if not name.endswith(APIDOC_SUFFIXES):
+                    continue
+                full = os.path.join(dirpath, name)
+                empty = os.path.getsize(full) <= 2
+                digest.update(f"{index}\0{os.path.relpath(full, path)}\0{empty:d}\n".encode())
+    return digest.hexdigest()
+
+
+def generate_api_stubs(source, options):
+    """Run sphinx-apidoc in-process and return ``{file name: text}``.
+
+    apidoc writes into a scratch directory; nothing under ``docs/api`` is
+    touched here. The ``modules.rst`` title is changed from "src" to
+    "Modules" in memory.
+    """
+    from sphinx.ext.apidoc import main as apidoc_main
+
+    with tempfile.TemporaryDirectory() as scratch:
+        apidoc_main(["-q", "-o", scratch, source, *options])
+        stubs = {}
+        for name in sorted(os.listdir(scratch)):
+            with open(os.path.join(scratch, name), encoding="utf-8") as f:
+                stubs[name] = f.read()
+
+    # sphinx-apidoc uses title and underline of same length.
+    # src       Modules
+    # ===   ->  =======
+    content = stubs.get("modules.rst", "")
+    if content.startswith("src\n==="):
+        stubs["modules.rst"] = content.replace("src\n===", "Modules\n=======", 1)
+    return stubs
+
+
+def merge_toc(texts):
+    """Join ``modules.rst`` files: the first one's title, every one's entries.
+
+    Each is a title followed by a single toctree whose entries are the
+    top-level packages of one source directory.
+    """
+    head, entries = [], []
+    for text in texts:
+        lines = text.rstrip("\n").split("\n")
+        start = lines.index(".. toctree::") + 1
+        while start < len(lines) and lines[start].strip():
+            start += 1  # the toctree's options
+        if not head:
+            head = lines[:start]
+        entries += [line for line in lines[start:] if line.strip() and line not in entries]
+    return "\n".join(head + [""] + entries) + "\n"
+
+
+def generate_all_stubs(sources, options):
+    """``generate_api_stubs()`` for every source directory, merged into one tree."""
+    merged, tocs = {}, []
+    for source in sources:
+        for name, text in generate_api_stubs(source, options).items():
+            if name == "modules.rst":
+                tocs.append(text)
+            elif name in merged and merged[name] != text:
+                # The same package in two members: document the first one.
+                print(f"sphinx-apidoc: {name} is generated from more than one source, "
+                      f"keeping the first")
+            else:
+                merged.setdefault(name, text)
+    if tocs:
+        merged["modules.rst"] = merge_toc(tocs)
+    return merged
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def file_hash(path):
+    """``text_hash()`` of the file at ``path``, or None if it cannot be read."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return text_hash(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def write_if_changed(path, text):
+    """Write ``text`` to ``path`` unless it already holds exactly that."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            if f.read() == text:
+                return False
+    except OSError:
+        pass
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return True
+
+
+def run_apidoc(app):
+    """Generate the API stubs under ``jbcom_apidoc_output``.
+
+    Stubs of modules that no longer exist are removed. The whole step is
+    skipped when the module tree hash matches the one recorded by the last
+    run (kept next to the doctrees, so ``make clean`` resets it) and every
+    generated file still holds what that run wrote. A stub overwritten by
+    a sync (the kit ships a placeholder ``api/modules.rst``) is therefore
+    regenerated.
+    """
+    sources = source_dirs(app.config.jbcom_apidoc_source)
+    output_dir = app.config.jbcom_apidoc_output or os.path.join(app.confdir, "api")
+    # Only run if a src directory exists
+    if not sources:
+        return
+
+    options = APIDOC_OPTIONS
+    stamp = os.path.join(app.doctreedir, "apidoc.json")
+    tree_hash = module_tree_hash(sources, options)
+    try:
+        with open(stamp) as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        previous = {}
+    previous_files = previous.get("files", {})
+    if not isinstance(previous_files, dict):
+        previous_files = dict.fromkeys(previous_files)  # stamps without hashes
+    if previous.get("hash") == tree_hash and all(
+        digest is not None and file_hash(os.path.join(output_dir, name)) == digest
+        for name, digest in previous_files.items()
+    ):
+        print("sphinx-apidoc: module tree unchanged, skipping")
+        return
+
+    try:
+        stubs = generate_all_stubs(sources, options)
+    except (Exception, SystemExit) as e:
+        # apidoc reports bad arguments with SystemExit; never abort the build.
+        print(f"Error running sphinx-apidoc: {e!r}")
+        return
+
+    os.makedirs(output_dir, exist_ok=True)
+    written = [name for name, text in stubs.items()
+               if write_if_changed(os.path.join(output_dir, name), text)]
+    # Stubs from the last run, plus any stub named after one of our top-level
+    # packages (left behind by older, subprocess-based runs), that apidoc no
+    # longer generates belong to modules that are gone.
+    packages = {name.split(".")[0] for name in stubs if name != "modules.rst"}
+    candidates = set(previous_files) | {
+        name for name in os.listdir(output_dir)
+        if name.endswith(".rst") and name.split(".")[0] in packages
+    }
+    removed = sorted(name for name in candidates if name not in stubs)
+    for name in removed:
+        try:
+            os.remove(os.path.join(output_dir, name))
+        except FileNotFoundError:
+            pass
+    print(f"sphinx-apidoc: {len(stubs)} stub(s), {len(written)} written, {len(removed)} removed")
+
+    os.makedirs(app.doctreedir, exist_ok=True)
+    with open(stamp, "w") as f:
+        json.dump({"hash": tree_hash,
+                   "files": {name: text_hash(text) for name, text in sorted(stubs.items())}}, f)
+
+
+def setup(app):
+    app.add_config_value("jbcom_apidoc_source", "", "env", types=(str, list))
+    app.add_config_value("jbcom_apidoc_output", "", "env")
+    app.connect("builder-inited", run_apidoc)
+    return {
+        "version": "1.0",
+        # Stubs are generated once in the main process before reading starts,
+        # and nothing is kept in the build environment.
+        "parallel_read_safe": True,
+        "parallel_write_safe": True,
+    }
@@ -0,0 +1,390 @@
+"""Cache rendered autodoc output on disk, per module, across builds.
+
+Synced from jbcom-control-center as part of the Python docs kit.
+
+Every ``auto*`` directive is replaced by a caching subclass of itself. The
+reST that autodoc generates for a directive (after napoleon and
+sphinx_autodoc_typehints have processed it) is stored together with the type
+hints autodoc records for ``autodoc_typehints = "description"``. When
+the same directive is met again with the same inputs, the stored reST is
+parsed directly and nothing is imported or introspected.
+
+An entry's key covers:
+
+* the directive (name, argument, options, content and current module);
+* the source of the documented module, of the modules it imports from the
+  documented source trees (transitively; every workspace package counts)
+  and of its parent packages' ``__init__``;
+* every config value that invalidates the environment (as normalised by
+  ``jbcom_config``), the loaded extensions and their versions, the Python
+  version and ``uv.lock``.
+
+Keys hold no absolute paths, so the cache directory
+(``$JBCOM_AUTODOC_CACHE`` or ``~/.cache/jbcom-docs/autodoc``) can be shared
+between checkouts and restored in CI. Entries are evicted least recently
+used first once the directory exceeds ``jbcom_autodoc_cache_max_bytes``.
+"""
+
+import ast
+import hashlib
+import json
+import os
+import sys
+
+from docutils import nodes
+from docutils.statemachine import StringList
+from sphinx.util import logging
+from sphinx.util.docutils import switch_source_input
+from sphinx.util.nodes import nested_parse_with_titles
+
+from jbcom_config import NEUTRAL_EXTENSIONS, config_snapshot
+from jbcom_workspace import source_dirs
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.environ.get("JBCOM_AUTODOC_CACHE") or os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+    "jbcom-docs", "autodoc",
+)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Bump when the entry format changes.
+FORMAT = 1
+
+_files = {}
+_stats = {"hits": 0, "misses": 0}
+
+
+def _file_info(path):
+    """``(sha256, local imports)`` of a source file, memoised by stat."""
+    st = os.stat(path)
+    stamp = (st.st_size, st.st_mtime_ns)
+    cached = _files.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    with open(path, "rb") as f:
+        data = f.read()
+    imports = []
+    try:
+        tree = ast.parse(data, path)
+    except (SyntaxError, ValueError):
+        tree = None
+    if tree is not None:
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                imports += [(0, alias.name, ()) for alias in node.names]
+            elif isinstance(node, ast.ImportFrom):
+                names = tuple(alias.name for alias in node.names)
+                imports.append((node.level, node.module or "", names))
+    info = (hashlib.sha256(data).hexdigest(), imports)
+    _files[path] = (stamp, info)
+    return info
+
+
+def module_file(sources, modname):
+    """Path of ``modname`` under one of ``sources``, or None."""
+    for source in sources:
+        base = os.path.join(source, *modname.split("."))
+        for path in (base + ".py", os.path.join(base, "__init__.py")):
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def _module_name(sources, path):
+    source = next(s for s in sources if path.startswith(os.path.join(s, "")))
+    rel = os.path.relpath(path, source)[:-len(".py")].split(os.sep)
+    if rel[-1] == "__init__":
+        rel.pop()
+    return ".".join(rel)
+
+
+def module_dependencies(sources, modname):
+    """Source files whose contents autodoc output for ``modname`` depends on.
+
+    That is the module itself, the modules under ``sources`` it imports
+    (followed transitively) and the ``__init__.py`` of its parent packages.
+    """
+    path = module_file(sources, modname)
+    if path is None:
+        return set()
+    parts = modname.split(".")
+    deps = {module_file(sources, ".".join(parts[:i])) for i in range(1, len(parts))}
+    deps.discard(None)
+    pending = [path]
+    seen = set()
+    while pending:
+        path = pending.pop()
+        if path in seen:
+            continue
+        seen.add(path)
+        current = _module_name(sources, path)
+        package = current if path.endswith("__init__.py") else current.rpartition(".")[0]
+        for level, name, names in _file_info(path)[1]:
+            if level:
+                anchor = package.split(".")[:len(package.split(".")) - level + 1]
+                name = ".".join(anchor + ([name] if name else []))
+            for candidate in [name] + [f"{name}.{n}" for n in names]:
+                found = module_file(sources, candidate) if candidate else None
+                if found is not None:
+                    pending.append(found)
+    return seen | deps
+
+
+def config_digest(app):
+    """Hash of everything outside the source tree that shapes autodoc output."""
+    config = app.config
+    digest = hashlib.sha256()
+    digest.update(repr((FORMAT, sys.version_info[:2])).encode())
+    # Normalised, so checkouts in different places share entries.
+    for name, value in sorted(config_snapshot(app, doctrees_only=True).items()):
+        digest.update(f"{name}={value}\n".encode())
+    for name, extension in sorted(app.extensions.items()):
+        if name not in NEUTRAL_EXTENSIONS:
+            digest.update(f"{name}={extension.version}\n".encode())
+    lock = config.jbcom_autodoc_cache_lock
+    if lock and os.path.isfile(lock):
+        digest.update(_file_info(lock)[0].encode())
+    return digest.hexdigest()
+
+
+class AutodocCache:
+    """Directory of rendered autodoc entries, one JSON file per key."""
+
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key, entry):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def prune(self):
+        """Evict least recently used entries until the cache fits; return count."""
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+def _annotations(env):
+    """The type hints autodoc records for ``autodoc_typehints = "description"``."""
+    current = getattr(env, "current_document", None)
+    if current is not None and hasattr(current, "autodoc_annotations"):
+        return current.autodoc_annotations
+    return env.temp_data.setdefault("annotations", {})
+
+
+class _Paths:
+    """Makes source paths in generated content portable between checkouts."""
+
+    def __init__(self, roots):
+        self.roots = [(f"{{{i}}}", os.path.join(root, "")) for i, root in enumerate(roots) if root]
+
+    def store(self, source):
+        for token, root in self.roots:
+            if source and source.startswith(root):
+                return token + source[len(root):]
+        return source
+
+    def load(self, source):
+        for token, root in self.roots:
+            if source and source.startswith(token):
+                return root + source[len(token):]
+        return source
+
+
+class CachedAutodoc:
+    """Mixin for autodoc's directive that reuses reST rendered by an earlier build."""
+
+    def _target(self):
+        """Module name the documented object lives in, if it is ours."""
+        sources = source_dirs(self.config.jbcom_autodoc_cache_source)
+        if not sources:
+            return None
+        name = self.arguments[0].split("(")[0].strip()
+        module = self.env.ref_context.get("py:module")
+        candidates = [name] + ([f"{module}.{name}"] if module else [])
+        for candidate in candidates:
+            parts = candidate.split(".")
+            for i in range(len(parts), 0, -1):
+                if module_file(sources, ".".join(parts[:i])):
+                    return ".".join(parts[:i])
+        return None
+
+    def _key(self, modname, deps, paths):
+        digest = hashlib.sha256()
+        digest.update(_config_digest(self.env.app).encode())
+        digest.update(repr((
+            self.name,
+            self.arguments,
+            sorted((k, str(v)) for k, v in self.options.items()),
+            list(self.content),
+            self.env.ref_context.get("py:module"),
+            self.env.ref_context.get("py:class"),
+            modname,
+        )).encode())
+        for path in sorted(deps):
+            rel = paths.store(path).replace(os.sep, "/")
+            digest.update(f"{rel}={_file_info(path)[0]}\n".encode())
+        return digest.hexdigest()
+
+    def run(self):
+        modname = self._target()
+        if modname is None:
+            return super().run()
+        sources = source_dirs(self.config.jbcom_autodoc_cache_source)
+        deps = module_dependencies(sources, modname)
+        paths = _Paths([*sources, self.env.srcdir])
+        key = self._key(modname, deps, paths)
+        cache = _cache(self.config)
+        annotations = _annotations(self.env)
+        record = self.state.document.settings.record_dependencies
+
+        entry = cache.get(key)
+        if entry is not None:
+            _stats["hits"] += 1
+            for path in deps:
+                record.add(path)
+            for name, hints in entry["annotations"].items():
+                annotations.setdefault(name, {}).update(hints)
+            content = StringList()
+            for text, src, offset in entry["lines"]:
+                content.append(text, paths.load(src), offset)
+            # As autodoc's own parse_generated_content() does.
+            with switch_source_input(self.state, content):
+                node = nodes.section()
+                node.document = self.state.document
+                nested_parse_with_titles(self.state, content, node)
+            return node.children
+
+        _stats["misses"] += 1
+        before = {name: dict(hints) for name, hints in annotations.items()}
+        generated = []
+        # autodoc hands the generated reST to a module-level function; wrap
+        # it for the duration of this directive to keep a copy.
+        module = sys.modules[self._autodoc_module]
+        original = module.parse_generated_content
+
+        def capture(state, content, *args, **kwargs):
+            generated.append(content)
+            return original(state, content, *args, **kwargs)
+
+        module.parse_generated_content = capture
+        try:
+            result = super().run()
+        finally:
+            module.parse_generated_content = original
+        if generated:
+            content = generated[0]
+            cache.put(key, {
+                "lines": [
+                    [text, paths.store(src), offset]
+                    for text, (src, offset) in zip(content.data, content.items)
+                ],
+                "annotations": {
+                    name: hints for name, hints in annotations.items()
+                    if before.get(name) != hints
+                },
+            })
+        return result
+
+
+_digests = {}
+
+
+def _config_digest(app):
+    # Computed once per build; forked parallel readers inherit it.
+    digest = _digests.get(id(app))
+    if digest is None:
+        digest = _digests[id(app)] = config_digest(app)
+    return digest
+
+
+def _cache(config):
+    return AutodocCache(config.jbcom_autodoc_cache_dir, config.jbcom_autodoc_cache_max_bytes)
+
+
+def install(app):
+    """Swap every registered autodoc directive for a caching subclass."""
+    _stats.update(hits=0, misses=0)
+    if not app.config.jbcom_autodoc_cache:
+        return
+    from docutils.parsers.rst import directives
+
+    # The directive class moved between Sphinx releases; take whatever
+    # autodoc registered for ``automodule``.
+    base = directives._directives.get("automodule")
+    if not isinstance(base, type) or issubclass(base, CachedAutodoc):
+        return
+    cached = type("CachedAutodocDirective", (CachedAutodoc, base), {
+        "_autodoc_module": base.__module__,
+    })
+    for name, directive in list(directives._directives.items()):
+        if directive is base:
+            app.add_directive(name, cached, override=True)
+
+
+def prune(app, exception):
+    if not app.config.jbcom_autodoc_cache or exception is not None:
+        return
+    if _stats["hits"] or _stats["misses"]:
+        logger.info(
+            "jbcom_autodoc_cache: %d hit(s), %d miss(es)", _stats["hits"], _stats["misses"]
+        )
+    removed = _cache(app.config).prune()
+    if removed:
+        logger.info("jbcom_autodoc_cache: evicted %d cache entries", removed)
+
+
+def setup(app):
+    app.setup_extension("sphinx.ext.autodoc")
+    app.add_config_value("jbcom_autodoc_cache", True, "")
+    app.add_config_value("jbcom_autodoc_cache_dir", DEFAULT_CACHE_DIR, "")
+    app.add_config_value("jbcom_autodoc_cache_max_bytes", DEFAULT_MAX_BYTES, "")
+    app.add_config_value("jbcom_autodoc_cache_source", "", "", types=(str, list))
+    app.add_config_value("jbcom_autodoc_cache_lock", "", "")
+    app.connect("builder-inited", install)
+    app.connect("build-finished", prune)
+    return {
+        "version": "1.0",
+        "parallel_read_safe": True,
+        "parallel_write_safe": True,
+    }
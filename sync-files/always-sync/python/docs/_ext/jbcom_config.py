@@ -0,0 +1,211 @@
+"""Keep the environment when a synced conf.py change cannot affect it.
+
+Synced from jbcom-control-center as part of the Python docs kit.
+
+``conf.py`` is synced to every repo, so Sphinx sees every edit to an
+environment-level value, or to the extension list, as a reason to re-read
+every document. This extension records a normalised snapshot of the
+environment-level config next to the doctrees after each build and, when
+Sphinx reports a config change, compares the two snapshots:
+
+* changes that cannot affect the doctrees are ignored: inventory paths
+  in ``intersphinx_mapping`` (only the URLs are compared), absolute paths
+  under the repository root, and adding or removing the kit extensions in
+  ``NEUTRAL_EXTENSIONS``;
+* changes confined to one extension's settings re-read only the documents
+  that extension touches (``SCOPES``): autodoc, napoleon and type-hint
+  settings re-read documents with autodoc directives, MyST settings
+  re-read Markdown documents;
+* intersphinx settings (``RESOLVE_ONLY``), which change as sibling
+  packages publish inventories to the shared store, only affect how
+  references are resolved: every page is rewritten, none is re-read;
+* anything else keeps Sphinx's full re-read.
+
+Branding and other ``html_*`` values are HTML-level, not environment-level:
+changing them rewrites pages but never re-reads them.
+"""
+
+import json
+import os
+import re
+
+from sphinx.util import logging
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT = "jbcom-config.json"
+
+# Kit extensions that do not change what is read into the environment.
+NEUTRAL_EXTENSIONS = frozenset({
+    "jbcom_apidoc",
+    "jbcom_autodoc_cache",
+    "jbcom_build_cache",
+    "jbcom_config",
+    "jbcom_inventory",
+    "jbcom_profile",
+})
+
+# Config name prefixes whose effect is limited to some documents, and a
+# regular expression matching the source of those documents.
+SCOPES = {
+    "autodoc": (
+        ("autodoc_", "autoclass_", "napoleon_", "typehints_", "always_document_param_types",
+         "always_use_bars_union", "simplify_optional_unions", "jbcom_autodoc_"),
+        re.compile(r"^\s*(\.\. |```\{|:::\{)auto(module|class|function|method|attribute"
+                   r"|data|exception|property|decorator)\b", re.MULTILINE),
+    ),
+    "autosummary": (
+        ("autosummary_",),
+        re.compile(r"^\s*(\.\. |```\{|:::\{)autosummary\b", re.MULTILINE),
+    ),
+    "myst": (
+        ("myst_",),
+        None,  # every Markdown document
+    ),
+}
+
+# Config name prefixes that only matter when references are resolved, as
+# pages are written; doctrees never depend on them.
+RESOLVE_ONLY = ("intersphinx_",)
+
+# Memory addresses in reprs of functions and objects in the config.
+_ADDRESS = re.compile(r" at 0x[0-9a-fA-F]+")
+
+
+def stable_repr(value):
+    """``repr`` that does not depend on set ordering or hash randomisation."""
+    if isinstance(value, (set, frozenset)):
+        return "{" + ", ".join(sorted(stable_repr(v) for v in value)) + "}"
+    if isinstance(value, dict):
+        items = sorted(f"{stable_repr(k)}: {stable_repr(v)}" for k, v in value.items())
+        return "{" + ", ".join(items) + "}"
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(stable_repr(v) for v in value) + "]"
+    return _ADDRESS.sub("", repr(value))
+
+
+def _urls(value):
+    """The URLs in an ``intersphinx_mapping`` entry, in any Sphinx format."""
+    if isinstance(value, str):
+        return [value] if "://" in value else []
+    if isinstance(value, (list, tuple)):
+        return [url for item in value for url in _urls(item)]
+    return []
+
+
+def config_snapshot(app, doctrees_only=False):
+    """``{name: normalised value}`` of every environment-level config value.
+
+    Paths under the repository root are made relative to it and inventory
+    locations are dropped from ``intersphinx_mapping``, so checkouts in
+    different places (a laptop and CI) produce the same snapshot. With
+    ``doctrees_only``, values in ``RESOLVE_ONLY`` are left out: caches of
+    doctrees and of autodoc output use that.
+    """
+    root = os.path.dirname(os.path.abspath(str(app.confdir)))
+    snapshot = {}
+    for item in app.config:
+        if item.rebuild != "env" or (doctrees_only and item.name.startswith(RESOLVE_ONLY)):
+            continue
+        value = item.value
+        if item.name == "intersphinx_mapping" and isinstance(value, dict):
+            value = {name: sorted(set(_urls(entry))) for name, entry in value.items()}
+        snapshot[item.name] = stable_repr(value).replace(root, "{root}")
+    snapshot["extensions"] = stable_repr(sorted(
+        name for name in app.config.extensions if name not in NEUTRAL_EXTENSIONS
+    ))
+    return snapshot
+
+
+def _scope(name):
+    if name.startswith(RESOLVE_ONLY):
+        return "resolve"
+    for scope, (prefixes, _) in SCOPES.items():
+        if name.startswith(prefixes):
+            return scope
+    return None
+
+
+def _snapshot_path(app):
+    return os.path.join(str(app.doctreedir), SNAPSHOT)
+
+
+def isolate(app):
+    """Downgrade a config change Sphinx detected to what it really affects."""
+    from sphinx.environment import CONFIG_CHANGED, CONFIG_EXTENSIONS_CHANGED, CONFIG_OK
+
+    app._jbcom_config_scopes = set()
+    env = app.env
+    if env.config_status not in (CONFIG_CHANGED, CONFIG_EXTENSIONS_CHANGED):
+        return
+    try:
+        with open(_snapshot_path(app)) as f:
+            old = json.load(f)
+    except (OSError, ValueError):
+        return
+    new = config_snapshot(app)
+    changed = sorted(name for name in old.keys() | new.keys() if old.get(name) != new.get(name))
+    scopes = {_scope(name) for name in changed}
+    if None in scopes:
+        return  # a change with unknown reach: let Sphinx re-read everything
+    env.config_status = CONFIG_OK
+    env.config_status_extra = ""
+    if "resolve" in scopes:
+        scopes.discard("resolve")
+        # A str from get_outdated_docs() makes the builder write every page.
+        app.builder.get_outdated_docs = lambda: "all pages (intersphinx settings changed)"
+        logger.info("jbcom_config: intersphinx settings changed, rewriting every page")
+    app._jbcom_config_scopes = scopes
+    if scopes:
+        logger.info("jbcom_config: config change limited to %s documents (%s)",
+                    ", ".join(sorted(scopes)), ", ".join(changed))
+    elif not changed:
+        logger.info("jbcom_config: config change does not affect the environment")
+
+
+def outdated(app, env, added, changed, removed):
+    """Documents to re-read because of a scoped config change."""
+    scopes = getattr(app, "_jbcom_config_scopes", set())
+    if not scopes:
+        return []
+    docnames = []
+    for docname in env.found_docs - added - changed:
+        path = str(env.doc2path(docname))
+        if "myst" in scopes and path.endswith(".md"):
+            docnames.append(docname)
+            continue
+        patterns = [SCOPES[s][1] for s in scopes if SCOPES[s][1] is not None]
+        if not patterns:
+            continue
+        try:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+        except (OSError, UnicodeDecodeError):
+            docnames.append(docname)
+            continue
+        if any(pattern.search(text) for pattern in patterns):
+            docnames.append(docname)
+    return docnames
+
+
+def record(app, exception):
+    """Store the snapshot the next build compares against."""
+    if exception is not None or not os.path.isdir(str(app.doctreedir)):
+        return
+    path = _snapshot_path(app)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(config_snapshot(app), f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def setup(app):
+    # After the environment is loaded and jbcom_apidoc has run, before reading.
+    app.connect("builder-inited", isolate, priority=800)
+    app.connect("env-get-outdated", outdated)
+    app.connect("build-finished", record)
+    return {
+        "version": "1.0",
+        "parallel_read_safe": True,
+        "parallel_write_safe": True,
+    }
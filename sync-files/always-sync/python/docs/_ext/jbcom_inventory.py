@@ -0,0 +1,245 @@
+"""Serve intersphinx inventories from a local, shared store.
+
+Synced from jbcom-control-center as part of the Python docs kit.
+
+Every ``intersphinx_mapping`` entry that would be fetched over the network is
+pointed at a copy in the store instead, so fresh and offline builds resolve
+cross-references with no network round-trip. Missing or expired copies are
+fetched once into the store (unless ``jbcom_inventory_offline`` is set) and
+reused by every repo on the machine.
+
+After an HTML build the project's own ``objects.inv`` is published to the
+store under its name. Building the ecosystem packages in dependency order
+(``extended-data-types`` first, its dependents after) therefore lets each
+one link to the packages below it through ``jbcom_inventory_packages``.
+
+Inventories are content-addressed (``objects/<sha256>.inv``) and listed in
+``index.json``; blobs no longer referenced and the least recently used
+entries are evicted once the store exceeds ``jbcom_inventory_max_bytes``.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import time
+import urllib.request
+
+from sphinx.util import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE = os.environ.get("JBCOM_INVENTORY_STORE") or os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+    "jbcom-docs", "inventories",
+)
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_TTL_DAYS = 7
+
+# Sibling packages whose inventories are linked when the store has them.
+DEFAULT_PACKAGES = {
+    name: f"https://jbcom.github.io/python-{name}/"
+    for name in (
+        "extended-data-types",
+        "lifecyclelogging",
+        "directed-inputs-class",
+        "vendor-connectors",
+        "agentic-crew",
+        "agentic-game-development",
+    )
+}
+
+
+class InventoryStore:
+    """Content-addressed ``objects.inv`` files shared between builds."""
+
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(root, "index.json")
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Serialise index updates between concurrent builds."""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, ".lock"), "w") as lock:
+            try:
+                import fcntl
+            except ImportError:  # Windows: best effort, writes are still atomic
+                yield
+                return
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_index(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index):
+        tmp = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(index, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.index_path)
+
+    def blob_path(self, sha256):
+        return os.path.join(self.root, "objects", f"{sha256}.inv")
+
+    def entry(self, name):
+        """Return the index entry for ``name`` if its blob is present."""
+        entry = self._read_index().get(name)
+        if entry and os.path.exists(self.blob_path(entry["sha256"])):
+            return entry
+        return None
+
+    def get(self, name):
+        """Return the path of the stored inventory for ``name``, marking it used."""
+        with self._locked():
+            index = self._read_index()
+            entry = index.get(name)
+            if not entry or not os.path.exists(self.blob_path(entry["sha256"])):
+                return None
+            entry["used"] = time.time()
+            self._write_index(index)
+        return self.blob_path(entry["sha256"])
+
+    def put(self, name, data, uri):
+        """Store ``data`` as the current inventory for ``name``."""
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(sha256)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        now = time.time()
+        with self._locked():
+            index = self._read_index()
+            index[name] = {"sha256": sha256, "uri": uri, "updated": now, "used": now}
+            self._write_index(index)
+        return path
+
+    def fetch(self, name, uri, timeout=10):
+        """Download ``<uri>/objects.inv`` into the store; None on failure."""
+        url = uri.rstrip("/") + "/objects.inv"
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as response:
+                data = response.read()
+        except OSError as exc:
+            logger.info("jbcom_inventory: could not fetch %s: %s", url, exc)
+            return None
+        return self.put(name, data, uri)
+
+    def prune(self):
+        """Evict unreferenced blobs, then least recently used entries, to fit."""
+        objects = os.path.join(self.root, "objects")
+        if not os.path.isdir(objects):
+            return []
+        with self._locked():
+            index = self._read_index()
+            live = {e["sha256"] for e in index.values()}
+            removed = []
+            sizes = {}
+            for name in os.listdir(objects):
+                sha256 = name[:-len(".inv")]
+                path = os.path.join(objects, name)
+                if sha256 not in live and name.endswith(".inv"):
+                    os.remove(path)
+                    removed.append(name)
+                elif name.endswith(".inv"):
+                    sizes[sha256] = os.path.getsize(path)
+            total = sum(sizes.values())
+            for name, entry in sorted(index.items(), key=lambda item: item[1].get("used", 0)):
+                if total <= self.max_bytes:
+                    break
+                del index[name]
+                sha256 = entry["sha256"]
+                if sha256 in sizes and sha256 not in {e["sha256"] for e in index.values()}:
+                    os.remove(self.blob_path(sha256))
+                    total -= sizes.pop(sha256)
+                    removed.append(f"{sha256}.inv")
+            self._write_index(index)
+        return removed
+
+
+def _store(config):
+    return InventoryStore(config.jbcom_inventory_store, config.jbcom_inventory_max_bytes)
+
+
+def _local_inventory(store, name, uri, config):
+    """Path of an up-to-date local copy of ``name``'s inventory, or None."""
+    entry = store.entry(name)
+    expired = entry is None or (
+        time.time() - entry.get("updated", 0) > config.jbcom_inventory_ttl * 86400
+    )
+    if expired and uri and not config.jbcom_inventory_offline:
+        store.fetch(name, uri)
+    return store.get(name)
+
+
+def use_local_inventories(app, config):
+    """Point ``intersphinx_mapping`` at the store before intersphinx reads it."""
+    store = _store(config)
+    mapping = dict(config.intersphinx_mapping)
+    for name, value in list(mapping.items()):
+        if not isinstance(value, (tuple, list)) or len(value) != 2:
+            continue
+        uri, inv = value
+        # Only entries that would be fetched from the network are redirected.
+        if inv is not None:
+            continue
+        path = _local_inventory(store, name, uri, config)
+        if path is not None:
+            mapping[name] = (uri, path)
+        elif config.jbcom_inventory_offline:
+            logger.info("jbcom_inventory: no stored inventory for %r, skipping offline", name)
+            del mapping[name]
+
+    for name, uri in config.jbcom_inventory_packages.items():
+        if name in mapping or name == config.project:
+            continue
+        # Sibling packages are only linked once their own build published
+        # (or a fetch found) an inventory; they are never required.
+        path = store.get(name)
+        if path is not None:
+            mapping[name] = (uri, path)
+    config.intersphinx_mapping = mapping
+
+
+def publish_inventory(app, exception):
+    """Store this project's ``objects.inv`` so sibling builds can link to it."""
+    if exception is not None or app.builder.format != "html":
+        return
+    inventory = os.path.join(app.outdir, "objects.inv")
+    if not os.path.exists(inventory):
+        return
+    config = app.config
+    uri = config.jbcom_inventory_packages.get(config.project, "")
+    store = _store(config)
+    with open(inventory, "rb") as f:
+        store.put(config.project, f.read(), uri)
+    store.prune()
+
+
+def setup(app):
+    app.add_config_value("jbcom_inventory_store", DEFAULT_STORE, "")
+    app.add_config_value("jbcom_inventory_packages", DEFAULT_PACKAGES, "env")
+    app.add_config_value(
+        "jbcom_inventory_offline", bool(os.environ.get("JBCOM_DOCS_OFFLINE")), ""
+    )
+    app.add_config_value("jbcom_inventory_ttl", DEFAULT_TTL_DAYS, "")
+    app.add_config_value("jbcom_inventory_max_bytes", DEFAULT_MAX_BYTES, "")
+    # Before sphinx.ext.intersphinx validates the mapping (priority 800).
+    app.connect("config-inited", use_local_inventories, priority=400)
+    app.connect("build-finished", publish_inventory)
+    return {
+        "version": "1.0",
+        "parallel_read_safe": True,
+        "parallel_write_safe": True,
+    }
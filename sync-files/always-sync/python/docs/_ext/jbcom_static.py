@@ -0,0 +1,365 @@
+"""Import-free autodoc: document modules from their source, not by running them.
+
+Synced from jbcom-control-center as part of the Python docs kit.
+
+With ``jbcom_autodoc_mode = "static"`` in ``conf.py``, every module under
+``jbcom_autodoc_source`` (a directory, or a list of them in workspace mode)
+is served to autodoc as a *stub module* compiled from its syntax tree:
+
+* functions and methods keep their signature, annotations (as strings),
+  docstring and line numbers, but their bodies are replaced by ``...``;
+* classes keep their bases, docstrings and attributes; ``dataclass``,
+  ``property`` and the other stdlib decorators listed in ``SAFE_DECORATORS``
+  are applied, other decorators are dropped;
+* imports of the standard library and of the documented packages are kept;
+  every other import binds a placeholder, so heavy SDKs are never imported
+  and a missing optional dependency cannot break the build;
+* assignments keep literal values and simple type expressions; anything
+  else is shown as its source text.
+
+Modules listed in ``jbcom_autodoc_import`` (and their submodules) are still
+imported for real, for the rare page that needs runtime introspection.
+"""
+
+import __future__
+import ast
+import importlib.abc
+import importlib.machinery
+import os
+import sys
+
+from sphinx.util import logging
+
+from jbcom_workspace import source_dirs
+
+logger = logging.getLogger(__name__)
+
+# Decorators that are cheap, side-effect free and change what autodoc shows.
+SAFE_DECORATORS = frozenset({
+    "property", "staticmethod", "classmethod",
+    "cached_property", "functools.cached_property",
+    "abstractmethod", "abc.abstractmethod",
+    "dataclass", "dataclasses.dataclass",
+    "final", "typing.final",
+    "unique", "enum.unique",
+})
+# Calls that may be evaluated when they appear in an assignment.
+SAFE_CALLS = frozenset({
+    "TypeVar", "typing.TypeVar", "ParamSpec", "typing.ParamSpec",
+    "NewType", "typing.NewType", "field", "dataclasses.field",
+    "auto", "enum.auto",
+})
+STDLIB = frozenset(getattr(sys, "stdlib_module_names", ())) | {"__future__"}
+
+
+class Unevaluated:
+    """Stands in for a value that was not computed; shows its source."""
+
+    def __init__(self, source):
+        self.source = source
+
+    def __repr__(self):
+        return self.source
+
+
+class _ExternalMeta(type):
+    """Metaclass of placeholders for names imported from other packages."""
+
+    def __getattr__(cls, name):
+        # Only the placeholder itself, not documented classes deriving from it.
+        if name.startswith("__") or "__jbcom_external__" not in cls.__dict__:
+            raise AttributeError(name)
+        return external(cls.__module__, f"{cls.__qualname__}.{name}")
+
+    def __getitem__(cls, item):
+        return cls
+
+    def __repr__(cls):
+        return f"{cls.__module__}.{cls.__qualname__}"
+
+
+def external(module, qualname=None):
+    """Placeholder for ``module.qualname`` (or the module itself).
+
+    It can be subclassed, subscripted, called and have attributes looked
+    up, so class statements and type expressions using it still work.
+    """
+    qualname = qualname or module
+    return _ExternalMeta(qualname.rpartition(".")[2], (), {
+        "__module__": module,
+        "__qualname__": qualname,
+        "__doc__": None,
+        "__jbcom_external__": True,
+    })
+
+
+def safe_bases(*thunks):
+    """Evaluate class bases one by one, dropping any that fail."""
+    bases = []
+    for thunk in thunks:
+        try:
+            base = thunk()
+        except Exception:
+            continue
+        if (isinstance(base, type) or hasattr(base, "__mro_entries__")) and base not in bases:
+            bases.append(base)
+    try:
+        # ``Generic[T]`` and friends are resolved by the class statement
+        # itself (which records ``__orig_bases__``); check the plain classes.
+        type("_", tuple(b for b in bases if isinstance(b, type)), {})
+    except TypeError:  # metaclass conflict or inconsistent MRO
+        return ()
+    except Exception:  # metaclasses such as EnumMeta need a real class body
+        pass
+    return tuple(bases)
+
+
+def _dotted(node):
+    if isinstance(node, ast.Call):
+        node = node.func
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if isinstance(node, ast.Name):
+        parts.append(node.id)
+        return ".".join(reversed(parts))
+    return None
+
+
+def _is_type_checking(test):
+    return _dotted(test) in ("TYPE_CHECKING", "typing.TYPE_CHECKING")
+
+
+class StubBuilder:
+    """Rewrites a module's syntax tree into an inert stub module."""
+
+    def __init__(self, source, packages):
+        self.source = source
+        self.packages = packages
+
+    def _segment(self, node):
+        return ast.get_source_segment(self.source, node) or "..."
+
+    def _unevaluated(self, node):
+        return ast.copy_location(ast.Call(
+            func=ast.Name("__jbcom_unevaluated__", ast.Load()),
+            args=[ast.Constant(self._segment(node))], keywords=[],
+        ), node)
+
+    def _evaluable(self, node):
+        """True for literals, names, attributes, subscripts and safe calls."""
+        for sub in ast.walk(node):
+            if isinstance(sub, ast.Call) and _dotted(sub.func) not in SAFE_CALLS:
+                return False
+            if isinstance(sub, (ast.Lambda, ast.NamedExpr, ast.Await, ast.Yield,
+                                ast.YieldFrom, ast.ListComp, ast.SetComp,
+                                ast.DictComp, ast.GeneratorExp)):
+                return False
+        return True
+
+    def _value(self, node):
+        return node if self._evaluable(node) else self._unevaluated(node)
+
+    def _guarded(self, target_nodes, value, original):
+        """``try: <targets> = value except Exception: <targets> = <source>``."""
+        assign = ast.copy_location(ast.Assign(targets=target_nodes, value=value), original)
+        fallback = ast.copy_location(
+            ast.Assign(targets=target_nodes, value=self._unevaluated(original.value)), original
+        )
+        return ast.copy_location(ast.Try(
+            body=[assign],
+            handlers=[ast.ExceptHandler(type=ast.Name("Exception", ast.Load()), name=None,
+                                        body=[fallback])],
+            orelse=[], finalbody=[],
+        ), original)
+
+    def _import(self, node):
+        if isinstance(node, ast.ImportFrom):
+            if node.level or (node.module or "").split(".")[0] in self.packages | STDLIB:
+                return [node]
+            return [
+                ast.copy_location(ast.Assign(
+                    targets=[ast.Name(alias.asname or alias.name, ast.Store())],
+                    value=ast.Call(ast.Name("__jbcom_external__", ast.Load()),
+                                   [ast.Constant(node.module), ast.Constant(alias.name)], []),
+                ), node)
+                for alias in node.names if alias.name != "*"
+            ]
+        kept, stubs = [], []
+        for alias in node.names:
+            if alias.name.split(".")[0] in self.packages | STDLIB:
+                kept.append(alias)
+                continue
+            bound = alias.asname or alias.name.split(".")[0]
+            module = alias.name if alias.asname else bound
+            stubs.append(ast.copy_location(ast.Assign(
+                targets=[ast.Name(bound, ast.Store())],
+                value=ast.Call(ast.Name("__jbcom_external__", ast.Load()),
+                               [ast.Constant(module)], []),
+            ), node))
+        if kept:
+            stubs.insert(0, ast.copy_location(ast.Import(names=kept), node))
+        return stubs
+
+    def _decorators(self, node):
+        return [d for d in node.decorator_list if _dotted(d) in SAFE_DECORATORS]
+
+    def _function(self, node):
+        if any(_dotted(d) in ("overload", "typing.overload") for d in node.decorator_list):
+            return []
+        body = []
+        docstring = ast.get_docstring(node, clean=False)
+        if docstring is not None:
+            body.append(node.body[0])
+        body.append(ast.Expr(ast.Constant(Ellipsis)))
+        args = node.args
+        args.defaults = [self._value(d) for d in args.defaults]
+        args.kw_defaults = [d if d is None else self._value(d) for d in args.kw_defaults]
+        node.body = body
+        node.decorator_list = self._decorators(node)
+        return [node]
+
+    def _class(self, node):
+        thunks = [ast.Lambda(
+            args=ast.arguments(posonlyargs=[], args=[], vararg=None, kwonlyargs=[],
+                               kw_defaults=[], kwarg=None, defaults=[]),
+            body=base,
+        ) for base in node.bases]
+        node.bases = [ast.Starred(ast.Call(ast.Name("__jbcom_bases__", ast.Load()), thunks, []),
+                                  ast.Load())] if thunks else []
+        node.keywords = []
+        node.decorator_list = self._decorators(node)
+        node.body = self.body(node.body) or [ast.Pass()]
+        return [node]
+
+    def _statement(self, node):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            return self._import(node)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            return self._function(node)
+        if isinstance(node, ast.ClassDef):
+            return self._class(node)
+        if isinstance(node, ast.Assign):
+            if self._evaluable(node.value):
+                return [self._guarded(node.targets, node.value, node)]
+            node.value = self._unevaluated(node.value)
+            return [node]
+        if isinstance(node, ast.AnnAssign):
+            if node.value is None:
+                return [node]
+            if not self._evaluable(node.value):
+                node.value = self._unevaluated(node.value)
+                return [node]
+            if not isinstance(node.target, ast.Name):
+                return []
+            # ``x: T`` records the annotation; the value is assigned guarded.
+            declaration = ast.copy_location(ast.AnnAssign(
+                target=node.target, annotation=node.annotation, value=None, simple=node.simple,
+            ), node)
+            target = ast.Name(node.target.id, ast.Store())
+            return [declaration, self._guarded([target], node.value, node)]
+        if isinstance(node, ast.If):
+            if _is_type_checking(node.test):
+                return []
+            return self.body(node.body)
+        if isinstance(node, (ast.Try, ast.With)):
+            return self.body(node.body)
+        if isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant):
+            return [node]  # docstrings and attribute doc comments
+        return []
+
+    def body(self, statements):
+        out = []
+        for node in statements:
+            out.extend(self._statement(node))
+        return out
+
+    def build(self, tree):
+        tree.body = self.body(tree.body)
+        return ast.fix_missing_locations(tree)
+
+
+class StubLoader(importlib.machinery.SourceFileLoader):
+    """Loads a module from its stub instead of executing its code."""
+
+    packages = frozenset()
+
+    def get_code(self, fullname):
+        # Never read or write bytecode caches: they hold the real module.
+        path = self.get_filename(fullname)
+        source = self.get_data(path).decode("utf-8")
+        tree = ast.parse(source, path)
+        stub = StubBuilder(source, self.packages).build(tree)
+        return compile(stub, path, "exec", flags=__future__.annotations.compiler_flag, dont_inherit=True)
+
+    def exec_module(self, module):
+        module.__dict__.update(
+            __jbcom_unevaluated__=Unevaluated,
+            __jbcom_external__=external,
+            __jbcom_bases__=safe_bases,
+            __jbcom_static__=True,
+        )
+        super().exec_module(module)
+
+
+class StaticFinder(importlib.abc.MetaPathFinder):
+    """Serves stub modules for the documented packages."""
+
+    def __init__(self, sources, packages, real_imports):
+        self.sources = list(sources)
+        self.packages = frozenset(packages)
+        self.real_imports = tuple(real_imports)
+        self.loader = type("BoundStubLoader", (StubLoader,), {"packages": self.packages})
+
+    def find_spec(self, fullname, path=None, target=None):
+        if fullname.split(".")[0] not in self.packages:
+            return None
+        if any(fullname == m or fullname.startswith(m + ".") for m in self.real_imports):
+            return None
+        spec = importlib.machinery.PathFinder.find_spec(fullname, path or self.sources)
+        if spec is None or not (spec.origin or "").endswith(".py"):
+            return None
+        spec.loader = self.loader(fullname, spec.origin)
+        return spec
+
+
+def top_level_packages(sources):
+    """Names importable from ``sources``: packages and top-level modules."""
+    names = set()
+    for source in sources:
+        for entry in os.listdir(source):
+            path = os.path.join(source, entry)
+            if entry.endswith(".py"):
+                names.add(entry[:-3])
+            elif os.path.isdir(path) and entry.isidentifier():
+                names.add(entry)
+    return names
+
+
+def install(app, config):
+    if config.jbcom_autodoc_mode != "static":
+        return
+    sources = source_dirs(config.jbcom_autodoc_source)
+    if not sources:
+        logger.warning("jbcom_static: jbcom_autodoc_source %r is not a directory",
+                       config.jbcom_autodoc_source)
+        return
+    packages = top_level_packages(sources)
+    stale = [m for m in sys.modules if m.split(".")[0] in packages]
+    for name in stale:
+        del sys.modules[name]
+    sys.meta_path.insert(0, StaticFinder(sources, packages, config.jbcom_autodoc_import))
+    logger.info("jbcom_static: documenting %s from source", ", ".join(sorted(packages)))
+
+
+def setup(app):
+    app.add_config_value("jbcom_autodoc_mode", "import", "env")
+    app.add_config_value("jbcom_autodoc_source", "", "env", types=(str, list))
+    app.add_config_value("jbcom_autodoc_import", [], "env")
+    app.connect("config-inited", install)
+    return {
+        "version": "1.0",
+        "parallel_read_safe": True,
+        "parallel_write_safe": True,
+    }
@@ -0,0 +1,67 @@
+"""Find the packages of a multi-package repository (workspace mode).
+
+Synced from jbcom-control-center as part of the Python docs kit.
+
+A repo with several packages, each with its own ``src/`` directory, is
+documented in one build rather than one build per package: the packages
+share a single Sphinx environment and API tree, and interpreter startup,
+extension loading and the intersphinx inventories are paid for once.
+
+``conf.py`` calls ``find_source_dirs()``, which returns the repo's own
+``src/`` (if any) followed by the ``src/`` of every workspace member. The
+members are those of ``[tool.uv.workspace]`` in ``pyproject.toml`` or,
+without one, ``packages/*``. A repo with a single package gets
+``[root/src]``, exactly as before.
+
+The kit's extensions take either a single directory or a list of them
+wherever they take a source directory; ``source_dirs()`` normalises the
+two.
+"""
+
+import glob
+import os
+
+# Members looked for when pyproject.toml does not list any.
+DEFAULT_MEMBERS = ("packages/*",)
+
+
+def _uv_workspace(root):
+    """The ``[tool.uv.workspace]`` table of ``root/pyproject.toml``, if any."""
+    try:
+        import tomllib
+    except ImportError:  # Python < 3.11
+        return {}
+    try:
+        with open(os.path.join(root, "pyproject.toml"), "rb") as f:
+            data = tomllib.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data.get("tool", {}).get("uv", {}).get("workspace", {})
+
+
+def _expand(root, patterns):
+    return {os.path.abspath(path) for pattern in patterns
+            for path in glob.glob(os.path.join(root, pattern))}
+
+
+def find_source_dirs(root):
+    """Source directories to document: ``root/src``, then each member's ``src``."""
+    workspace = _uv_workspace(root)
+    members = _expand(root, workspace.get("members") or DEFAULT_MEMBERS)
+    members -= _expand(root, workspace.get("exclude", ()))
+    own = os.path.join(root, "src")
+    found = [own] if os.path.isdir(own) else []
+    for member in sorted(members):
+        src = os.path.join(member, "src")
+        if os.path.isdir(src):
+            found.append(src)
+    return found or [own]
+
+
+def source_dirs(value):
+    """A source directory config value as a list of existing directories."""
+    if not value:
+        return []
+    if isinstance(value, (str, os.PathLike)):
+        value = [value]
+    return [os.fspath(path) for path in value if os.path.isdir(path)]
@@ -7,7 +7,6 @@
 
 import os
 import sys
-import subprocess
 from datetime import datetime
 
 # -- Path setup --------------------------------------------------------------
@@ -17,8 +16,19 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 root_dir = os.path.abspath(os.path.join(current_dir, ".."))
 src_dir = os.path.join(root_dir, "src")
 
+# Local extensions shipped with the docs kit (docs/_ext)
+sys.path.insert(0, os.path.join(current_dir, "_ext"))
+
+# Workspace mode: a repo with several packages (uv workspace members, or
+# packages/*/src) documents all of them in one build, with one environment
+# and one API tree. A single-package repo gets [src_dir].
+from jbcom_workspace import find_source_dirs  # noqa: E402
+
+src_dirs = find_source_dirs(root_dir)
+
 # Add source to path for autodoc
-sys.path.insert(0, src_dir)
+for source in reversed(src_dirs):
+    sys.path.insert(1, source)
 
 # -- Project information -----------------------------------------------------
 
@@ -61,6 +71,20 @@ extensions = [
     "sphinx_autodoc_typehints",
     # Markdown support
     "myst_parser",
+    # API stub generation (docs/_ext/jbcom_apidoc.py)
+    "jbcom_apidoc",
+    # Local intersphinx inventory store (docs/_ext/jbcom_inventory.py)
+    "jbcom_inventory",
+    # Import-free autodoc mode (docs/_ext/jbcom_static.py)
+    "jbcom_static",
+    # Rendered autodoc output cache (docs/_ext/jbcom_autodoc_cache.py)
+    "jbcom_autodoc_cache",
+    # Opt-in build profiling, see `make profile` (docs/_ext/jbcom_profile.py)
+    "jbcom_profile",
+    # Environment/doctree cache for fresh checkouts (docs/_ext/jbcom_build_cache.py)
+    "jbcom_build_cache",
+    # Config changes re-read only what they affect (docs/_ext/jbcom_config.py)
+    "jbcom_config",
     # Diagrams (optional - requires sphinxcontrib-mermaid)
     # "sphinxcontrib.mermaid",
 ]
@@ -91,7 +115,9 @@ html_title = f"{project} Documentation"
 
 html_theme_options = {
     "navigation_depth": 4,
-    "collapse_navigation": False,
+    # Fully expanded, the sidebar costs every page time in proportion to the
+    # whole site; a workspace only expands the current package's branch.
+    "collapse_navigation": len(src_dirs) > 1,
     "sticky_navigation": True,
     "includehidden": True,
     "titles_only": False,
@@ -122,6 +148,8 @@ napoleon_use_param = True
 napoleon_use_rtype = True
 
 # intersphinx settings
+# Inventories are served from a shared local store (see jbcom_inventory);
+# set JBCOM_DOCS_OFFLINE=1 to never touch the network.
 intersphinx_mapping = {
     "python": ("https://docs.python.org/3", None),
 }
@@ -135,53 +163,25 @@ myst_enable_extensions = [
 ]
 myst_heading_anchors = 3
 
-# -- Setup for sphinx-apidoc -------------------------------------------------
-
-def run_apidoc(app):
-    """Run sphinx-apidoc to generate API documentation."""
-    # Only run if src directory exists
-    if os.path.exists(src_dir):
-        output_dir = os.path.join(current_dir, "api")
-
-        # Use subprocess to run sphinx-apidoc to avoid environment issues
-        # -o: output directory
-        # -f: force overwriting
-        # -M: put module documentation before submodule documentation
-        # -e: put documentation for each module on its own page
-        cmd = [
-            sys.executable, "-m", "sphinx.ext.apidoc",
-            "-o", output_dir,
-            src_dir,
-            "--force",
-            "--module-first",
-            "--separate"
-        ]
-
-        try:
-            print(f"Running sphinx-apidoc: {' '.join(cmd)}")
-            subprocess.run(cmd, check=True)
-
-            # Post-process modules.rst to change title from "src" to "Modules"
-            modules_rst = os.path.join(output_dir, "modules.rst")
-            if os.path.exists(modules_rst):
-                with open(modules_rst, "r") as f:
-                    content = f.read()
-
-                # sphinx-apidoc uses title and underline of same length.
-                # src
-                # ===
-                if content.startswith("src\n==="):
-                     # Replace with Modules
-                     # Modules
-                     # =======
-                     content = content.replace("src\n===", "Modules\n=======", 1)
-                     with open(modules_rst, "w") as f:
-                         f.write(content)
-
-        except subprocess.CalledProcessError as e:
-            print(f"Error running sphinx-apidoc: {e}")
-        except Exception as e:
-            print(f"Unexpected error running sphinx-apidoc: {e}")
-
-def setup(app):
-    app.connect('builder-inited', run_apidoc)
+# jbcom_apidoc settings
+jbcom_apidoc_source = src_dirs
+jbcom_apidoc_output = os.path.join(current_dir, "api")
+
+# jbcom_static settings
+# "import" imports every module for autodoc. "static" documents them from
+# their source without importing anything (no SDKs, no optional
+# dependencies); list modules that still need a real import in
+# jbcom_autodoc_import.
+jbcom_autodoc_mode = "import"
+jbcom_autodoc_source = src_dirs
+jbcom_autodoc_import = []
+
+# jbcom_autodoc_cache settings
+# Shared with CI by pointing JBCOM_AUTODOC_CACHE at a cached directory.
+jbcom_autodoc_cache_source = src_dirs
+jbcom_autodoc_cache_lock = os.path.join(root_dir, "uv.lock")
+
+# jbcom_build_cache settings
+# Shared with CI by pointing JBCOM_BUILD_CACHE at a cached directory.
+jbcom_build_cache_sources = src_dirs
+jbcom_build_cache_lock = os.path.join(root_dir, "uv.lock")